@@ -0,0 +1,160 @@
+"""Solve large numbers of random boards and report how good they are.
+
+    python analyze_boards.py --boards 1000000
+    python analyze_boards.py --boards 200000 --vowel-share 0.35 --csv boards.csv
+    python analyze_boards.py --boards 50000 --vetted boards.jsonl
+
+For tuning generate_grid and calculate_score. Boards are generated from seeds
+exactly as the game does (engine.grid_from_seed), solved in batches by the
+NumPy solver (engine/batchsolver.py) in --workers processes, and summarised:
+the distribution of word counts and best possible scores, how many boards
+the pool would accept (BOARD_MIN_WORDS, BOARD_MIN_SCORE), word counts by the
+number of vowels on the board, how often each letter appears and how many
+words of each length there are.
+
+--csv writes one row per board. --vetted writes the acceptable boards as
+JSON lines of {"seed", "grid", "words", "max_score"}, ready to feed a board
+pool with BoardPool.load(grids, seeds). Seeds are only written when
+--vowel-share is the game's own, since otherwise grid_from_seed would not
+give the same grid back.
+
+Needs numpy (pip install numpy), which the game servers do not.
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import string
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import numpy as np
+except ImportError:
+    raise SystemExit('analyze_boards.py needs numpy: pip install numpy')
+
+from engine import BoardGenerator, calculate_score, generate_grid, load_dictionary
+from engine.batchsolver import Trie, board_stats, grids_to_array
+from engine.boards import SEED_BITS, VOWEL_SHARE
+
+VOWELS = np.array([string.ascii_lowercase.index(vowel) for vowel in 'aeiou'])
+
+# The trie of a solver process, set when the process starts
+_trie = None
+
+
+def _start_worker(trie):
+    global _trie
+    _trie = trie
+
+
+def analyze_chunk(task):
+    """Generate and solve one chunk of boards: (seeds, size, vowel share) -> stats"""
+    seeds, size, vowel_share = task
+    grids = grids_to_array([generate_grid(size, random.Random(seed), vowel_share) for seed in seeds])
+    return (seeds, grids, *board_stats(_trie, grids, size, size))
+
+
+def percentiles(values):
+    points = (1, 10, 50, 90, 99)
+    return '  '.join(f"p{point} {value:g}" for point, value in zip(points, np.percentile(values, points)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Solve random boards in bulk and report their statistics')
+    parser.add_argument('--boards', type=int, default=100000)
+    parser.add_argument('--size', type=int, default=4)
+    parser.add_argument('--vowel-share', type=float, default=VOWEL_SHARE,
+                        help=f"Share of the grid given to vowels (the game uses {VOWEL_SHARE})")
+    parser.add_argument('--seed', type=int, help='Seed for the sequence of board seeds, for repeatable runs')
+    parser.add_argument('--dictionary', help='Compiled word list (default WORDGAME_DICTIONARY)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Solver processes (0 solves in this process)')
+    parser.add_argument('--chunk', type=int, default=512, help='Boards solved together in one batch')
+    parser.add_argument('--min-words', type=int, help='Default BOARD_MIN_WORDS')
+    parser.add_argument('--min-score', type=int, help='Default BOARD_MIN_SCORE')
+    parser.add_argument('--csv', help='Write every board to this CSV file')
+    parser.add_argument('--vetted', help='Write the acceptable boards to this JSON lines file')
+    args = parser.parse_args()
+
+    generator = BoardGenerator(generate_grid, None, calculate_score, args.min_words, args.min_score)
+    start = time.time()
+    trie = Trie(load_dictionary(args.dictionary), max_length=args.size * args.size)
+    print(f"Built the dictionary trie ({len(trie)} nodes) in {time.time() - start:.2f}s")
+
+    seeds = random.Random(args.seed)
+    tasks = []
+    for first in range(0, args.boards, args.chunk):
+        count = min(args.chunk, args.boards - first)
+        tasks.append(([seeds.getrandbits(SEED_BITS) for _ in range(count)], args.size, args.vowel_share))
+
+    executor = None
+    if args.workers > 0:
+        executor = ProcessPoolExecutor(max_workers=args.workers, initializer=_start_worker, initargs=(trie,))
+        results = executor.map(analyze_chunk, tasks)
+    else:
+        _start_worker(trie)
+        results = map(analyze_chunk, tasks)
+
+    csv_file = open(args.csv, 'w', newline='') if args.csv else None
+    writer = csv.writer(csv_file) if csv_file else None
+    if writer:
+        writer.writerow(['seed', 'grid', 'vowels', 'words', 'max_score'])
+    vetted = open(args.vetted, 'w') if args.vetted else None
+    keep_seeds = args.vowel_share == VOWEL_SHARE
+
+    cells = args.size * args.size
+    all_words, all_scores, all_vowels = [], [], []
+    letters = np.zeros(26, dtype=np.int64)
+    lengths = np.zeros(cells + 1, dtype=np.int64)
+    start = time.time()
+    for chunk_seeds, grids, words, max_scores, chunk_lengths in results:
+        vowels = np.isin(grids, VOWELS).sum(axis=1)
+        all_words.append(words)
+        all_scores.append(max_scores)
+        all_vowels.append(vowels)
+        letters += np.bincount(grids.ravel(), minlength=26)
+        lengths += chunk_lengths.sum(axis=0)
+
+        if not (writer or vetted):
+            continue
+        rows = zip(chunk_seeds, grids, vowels.tolist(), words.tolist(), max_scores.tolist())
+        for seed, grid, vowel_count, word_count, max_score in rows:
+            letters_text = bytes(grid + ord('a')).decode('ascii')
+            if writer:
+                writer.writerow([seed, letters_text, vowel_count, word_count, max_score])
+            if vetted and word_count >= generator.min_words and max_score >= generator.min_score:
+                layout = [list(letters_text[i:i + args.size]) for i in range(0, cells, args.size)]
+                vetted.write(json.dumps({'seed': seed if keep_seeds else None, 'grid': layout,
+                                         'words': word_count, 'max_score': max_score}) + '\n')
+    elapsed = time.time() - start
+    if executor is not None:
+        executor.shutdown()
+    for f in (csv_file, vetted):
+        if f:
+            f.close()
+
+    words, scores, vowels = np.concatenate(all_words), np.concatenate(all_scores), np.concatenate(all_vowels)
+    accepted = (words >= generator.min_words) & (scores >= generator.min_score)
+    print(f"Solved {len(words)} boards in {elapsed:.2f}s ({len(words) / elapsed:.0f} boards/s)")
+    print(f"words      mean {words.mean():.1f}  {percentiles(words)}")
+    print(f"max score  mean {scores.mean():.1f}  {percentiles(scores)}")
+    print(f"acceptable {accepted.mean():.1%} (at least {generator.min_words} words and {generator.min_score} points)")
+
+    print('by vowels  boards    mean words  acceptable')
+    for count in np.unique(vowels):
+        chosen = vowels == count
+        print(f"  {count:>6}  {chosen.mean():>7.1%}  {words[chosen].mean():>10.1f}  {accepted[chosen].mean():>9.1%}")
+
+    print('letters    share of boards')
+    for letter, share in sorted(zip(string.ascii_lowercase, letters / len(words)), key=lambda item: -item[1]):
+        print(f"  {letter}  {share:>6.1%}")
+
+    print('length     share of words  points')
+    for length in np.nonzero(lengths)[0]:
+        print(f"  {length:>6}  {lengths[length] / lengths.sum():>13.1%}  {calculate_score('a' * length):>6}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""Asyncio entry point: the real-time game on python-socketio's AsyncServer
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000 --ws wsproto
+
+Connections live on the event loop, so an idle websocket costs a little memory
+rather than a thread, and one process can hold tens of thousands of them. The
+game logic is the same as in app.py (realtime.py) and still blocks on the
+store, so every event runs on a thread pool of ASGI_THREADS threads while the
+loop carries on; board generation already happens in the background pool.
+Event names and payloads are the same as with wsgi.py.
+"""
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import socketio
+from flask import Flask, render_template
+
+import realtime
+from metrics import http_request_seconds, lag_monitor, registry
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Threads running game events; each event holds one only while it works
+executor = ThreadPoolExecutor(max_workers=int(os.getenv('ASGI_THREADS', 32)), thread_name_prefix='game-event')
+
+client_manager = socketio.AsyncRedisManager(realtime.message_queue) if realtime.message_queue else None
+sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*', client_manager=client_manager)
+
+
+class LoopTransport:
+    """Lets game logic running on executor threads use the asyncio server
+
+    Each call waits for the loop to carry it out, so events reach a client in
+    the order they were sent. Never call it from the loop thread itself.
+    """
+
+    def __init__(self, server, loop):
+        self.server = server
+        self.loop = loop
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def emit(self, event, data=None, to=None):
+        self._run(self.server.emit(event, data, to=to))
+
+    def enter_room(self, sid, room):
+        self._run(self.server.enter_room(sid, room))
+
+    def leave_room(self, sid, room):
+        self._run(self.server.leave_room(sid, room))
+
+    def close_room(self, room):
+        self._run(self.server.close_room(room))
+
+
+async def run_in_executor(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+
+
+@sio.event
+async def connect(sid, environ, auth=None):
+    await run_in_executor(realtime.handle_connect, sid)
+
+
+@sio.event
+async def disconnect(sid, reason=None):
+    await run_in_executor(realtime.handle_disconnect, sid)
+
+
+def forward(handler):
+    async def on_event(sid, data=None):
+        await run_in_executor(handler, sid, data)
+    return on_event
+
+
+for event, handler in realtime.EVENTS.items():
+    sio.on(event, forward(handler))
+
+
+# The page is rendered once with Flask so its asset URLs match the WSGI server's
+flask_app = Flask(__name__)
+with flask_app.test_request_context('/'):
+    INDEX = render_template('index.html').encode()
+
+
+async def respond(send, status, body, content_type):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', content_type.encode()), (b'content-length', str(len(body)).encode())]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def http_app(scope, receive, send):
+    """The plain HTTP routes of app.py: the page, stats, leaderboard and metrics"""
+    if scope['type'] != 'http':
+        return
+    started = time.perf_counter()
+    path = scope['path']
+    if path == '/':
+        await respond(send, 200, INDEX, 'text/html; charset=utf-8')
+    elif path == '/api/stats':
+        metrics = await run_in_executor(realtime.service.room_reaper.metrics)
+        await respond(send, 200, json.dumps(metrics).encode(), 'application/json')
+    elif path == '/metrics':
+        body = await run_in_executor(registry.render)
+        await respond(send, 200, body.encode(), 'text/plain; version=0.0.4')
+    elif path == '/api/leaderboard':
+        body = json.dumps({'leaderboard': realtime.service.match_history.leaderboard.top()}).encode()
+        await respond(send, 200, body, 'application/json')
+    elif path.startswith('/api/players/'):
+        player = await run_in_executor(realtime.service.match_history.player, path[len('/api/players/'):])
+        if player is None:
+            await respond(send, 404, json.dumps({'error': 'No games recorded for this player'}).encode(),
+                          'application/json')
+        else:
+            await respond(send, 200, json.dumps(player).encode(), 'application/json')
+        path = '/api/players/<name>'
+    else:
+        await respond(send, 404, b'Not Found', 'text/plain')
+        path = 'unmatched'
+    http_request_seconds.observe(time.perf_counter() - started, path)
+
+
+async def startup():
+    loop = asyncio.get_running_loop()
+    realtime.use_transport(LoopTransport(sio, loop))
+    loop.create_task(lag_monitor.watch())
+
+
+app = socketio.ASGIApp(sio, other_asgi_app=http_app, static_files={'/static': os.path.join(ROOT, 'static')},
+                       on_startup=startup)
@@ -0,0 +1,39 @@
+"""Background threads of the apps, started once the serving process exists
+
+Normally a service starts as soon as its module registers it. When gunicorn
+preloads the app in its master process (GUNICORN_PRELOAD=1, see
+gunicorn.conf.py), threads started there would not survive the fork into
+the workers, so the master sets WORDGAME_DEFER_THREADS and each worker starts
+every registered service from the post_fork hook instead.
+"""
+import os
+
+deferred = os.getenv('WORDGAME_DEFER_THREADS') == '1'
+_services = []
+
+
+def start(service):
+    """Start a service (anything with a start() method), now or after the fork"""
+    _services.append(service)
+    if not deferred:
+        service.start()
+    return service
+
+
+def stop_all():
+    """Stop every registered service that can be stopped; called as a worker exits"""
+    for service in _services:
+        stop = getattr(service, 'stop', None)
+        if stop is not None:
+            try:
+                stop()
+            except Exception as exc:
+                print(f"Error stopping {type(service).__name__}: {exc!r}")
+
+
+def start_all():
+    """Start every registered service; called in a worker just after it is forked"""
+    global deferred
+    deferred = False
+    for service in _services:
+        service.start()
@@ -0,0 +1,46 @@
+import os
+import threading
+import time
+
+
+class EventBatcher:
+    """Collects per-room updates and flushes each room's batch once per tick
+
+    With N players all finding words, sending every update on its own costs
+    O(N^2) messages per room; batching makes it one message per player per
+    tick however busy the room is. flush(room, items) runs on the batcher
+    thread for every room that had updates during the tick.
+    """
+
+    def __init__(self, flush, interval=None):
+        self.flush = flush
+        self.interval = interval if interval is not None else float(os.getenv('BROADCAST_TICK', 0.25))
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        """Start the flush thread (safe to call more than once)"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='event-batcher', daemon=True)
+                self._thread.start()
+
+    def add(self, room, item):
+        with self._lock:
+            self._pending.setdefault(room, []).append(item)
+
+    def drain(self):
+        """Flush everything collected so far"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for room, items in pending.items():
+            try:
+                self.flush(room, items)
+            except Exception as exc:
+                print(f"Error broadcasting to room {room}: {exc!r}")
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.drain()
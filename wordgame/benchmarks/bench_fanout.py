@@ -0,0 +1,210 @@
+"""Load test: room capacity of the Socket.IO server as worker processes are added.
+
+    python benchmarks/bench_fanout.py --workers 1 2 4 --rooms 25 50 100 200
+
+For each worker count this starts a local broker (or uses --broker-url), one
+gunicorn instance per worker sharing SOCKETIO_MESSAGE_QUEUE and GAME_STORE_URL,
+and then plays rooms whose two players are deliberately connected to different
+workers, so every opponents_found_words batch has to cross the message queue. A room
+level counts as sustained when at least 99% of those events arrive and their
+p99 delivery latency stays under --max-p99 milliseconds.
+
+Needs gunicorn, fakeredis (for the local broker) and python-socketio[client].
+"""
+import argparse
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import socketio
+
+from engine import calculate_score, load_dictionary, solve_grid
+
+english_words = load_dictionary()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Nothing listening on port {port}")
+
+
+class Cluster:
+    """A broker plus one gunicorn instance per worker"""
+
+    def __init__(self, workers, broker_url=None):
+        self.processes = []
+        if broker_url is None:
+            port = free_port()
+            self.processes.append(subprocess.Popen(
+                [sys.executable, 'local_broker.py', '--port', str(port)], cwd=ROOT, stdout=subprocess.DEVNULL))
+            wait_for_port(port)
+            broker_url = f"redis://127.0.0.1:{port}/0"
+
+        env = dict(os.environ, SOCKETIO_MESSAGE_QUEUE=broker_url, GAME_STORE_URL=broker_url)
+        self.urls = []
+        for _ in range(workers):
+            port = free_port()
+            self.processes.append(subprocess.Popen(
+                ['gunicorn', '-c', 'gunicorn.conf.py', '-b', f"127.0.0.1:{port}", 'wsgi:app'],
+                cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+            self.urls.append(f"http://127.0.0.1:{port}")
+        for url in self.urls:
+            wait_for_port(int(url.rsplit(':', 1)[1]))
+
+    def close(self):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.wait()
+
+
+class Bot:
+    """One player connected to one worker"""
+
+    def __init__(self, url, stats):
+        self.stats = stats
+        self.client = socketio.Client()
+        self.player_id = None
+        self.room_code = None
+        self.grid = None
+        self.created = threading.Event()
+        self.started = threading.Event()
+        self.client.on('game_created', self._on_created)
+        self.client.on('game_started', self._on_started)
+        self.client.on('opponents_found_words', self._on_opponent_words)
+        self.client.connect(url, transports=['websocket'])
+
+    def _on_created(self, data):
+        self.player_id = data['player_id']
+        self.room_code = data['room_code']
+        self.created.set()
+
+    def _on_started(self, data):
+        self.grid = data['grid']
+        self.started.set()
+
+    def _on_opponent_words(self, data):
+        # Batches go to the whole room; only count the other player's words
+        for update in data['updates']:
+            if update['player_id'] == self.client.get_sid():
+                continue
+            sent = self.stats.sent.pop((update['player_id'], update['score']), None)
+            if sent is not None:
+                self.stats.record(time.perf_counter() - sent)
+
+    def submit(self, word, score_after):
+        self.stats.sent[(self.client.get_sid(), score_after)] = time.perf_counter()
+        self.client.emit('submit_word', {'word': word})
+
+    def close(self):
+        self.client.disconnect()
+
+
+class Stats:
+    def __init__(self):
+        self.sent = {}
+        self.latencies = []
+        self.expected = 0
+        self.lock = threading.Lock()
+
+    def record(self, latency):
+        with self.lock:
+            self.latencies.append(latency)
+
+
+def run_level(cluster, rooms, duration):
+    stats = Stats()
+    pairs = []
+    for i in range(rooms):
+        # Put the two players of every room on different workers when possible
+        host = Bot(cluster.urls[i % len(cluster.urls)], stats)
+        guest = Bot(cluster.urls[(i + 1) % len(cluster.urls)], stats)
+        host.client.emit('create_game', {'name': f"host{i}"})
+        host.created.wait(10)
+        guest.client.emit('join_game', {'room_code': host.room_code, 'name': f"guest{i}"})
+        pairs.append((host, guest))
+
+    plans = []
+    for host, guest in pairs:
+        if not (host.started.wait(10) and guest.started.wait(10)):
+            continue
+        words = sorted(solve_grid(host.grid, english_words))
+        random.shuffle(words)
+        plans.append((host, words[0::2]))
+        plans.append((guest, words[1::2]))
+
+    # Every bot submits one word every half second for the duration
+    deadline = time.time() + duration
+    totals = {id(bot): 0 for bot, _ in plans}
+    step = 0
+    while time.time() < deadline:
+        for bot, words in plans:
+            if step < len(words):
+                totals[id(bot)] += calculate_score(words[step])
+                bot.submit(words[step], totals[id(bot)])
+                stats.expected += 1
+        step += 1
+        time.sleep(0.5)
+
+    time.sleep(1)
+    for host, guest in pairs:
+        host.close()
+        guest.close()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cross-worker fan-out load test')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--rooms', type=int, nargs='+', default=[25, 50, 100, 200])
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--max-p99', type=float, default=250, help='Latency budget in ms')
+    parser.add_argument('--broker-url', help='Use an existing Redis instead of the local broker')
+    args = parser.parse_args()
+
+    print(f"{'workers':>7} {'rooms':>6} {'delivered':>10} {'p50 ms':>8} {'p99 ms':>8}")
+    capacity = {}
+    for workers in args.workers:
+        cluster = Cluster(workers, args.broker_url)
+        try:
+            for rooms in args.rooms:
+                stats = run_level(cluster, rooms, args.duration)
+                latencies = sorted(stats.latencies) or [float('inf')]
+                delivered = len(stats.latencies) / max(stats.expected, 1)
+                p50 = statistics.median(latencies) * 1e3
+                p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1e3
+                print(f"{workers:>7} {rooms:>6} {delivered:>9.1%} {p50:>8.1f} {p99:>8.1f}")
+                if delivered < 0.99 or p99 > args.max_p99:
+                    break
+                capacity[workers] = rooms
+        finally:
+            cluster.close()
+
+    print()
+    for workers in args.workers:
+        rooms = capacity.get(workers, 0)
+        print(f"{workers} worker(s): sustained {rooms} rooms ({rooms / workers:.0f} per worker)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""Microbenchmark: bitmask path search vs. the original recursive is_word_in_grid.
+
+    python benchmarks/bench_gridsearch.py
+
+Cases are chosen to be adversarial for path search: boards full of repeated
+letters where almost every prefix matches and the final letter fails.
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import GridSearch, is_word_in_grid
+
+
+def legacy_is_word_in_grid(word, grid):
+    """Original recursive search, kept here as the baseline"""
+    size = len(grid)
+    word = word.lower()
+    
+    # Helper function to find all occurrences of the first letter
+    def find_starting_positions(letter):
+        positions = []
+        for i in range(size):
+            for j in range(size):
+                if grid[i][j] == letter:
+                    positions.append((i, j))
+        return positions
+    
+    # Helper function to check if we can form the word starting at position
+    def search_from_position(pos, remaining, used_positions):
+        row, col = pos
+        
+        # If we've used all letters, we found the word
+        if not remaining:
+            return True
+        
+        # Get the next letter to find
+        next_letter = remaining[0]
+        
+        # Check all adjacent cells
+        for dr in [-1, 0, 1]:
+            for dc in [-1, 0, 1]:
+                # Skip the current cell
+                if dr == 0 and dc == 0:
+                    continue
+                
+                # Calculate neighbor position
+                new_row, new_col = row + dr, col + dc
+                
+                # Check if the position is valid, has the right letter, and hasn't been used
+                if (0 <= new_row < size and 0 <= new_col < size and 
+                    grid[new_row][new_col] == next_letter and 
+                    (new_row, new_col) not in used_positions):
+                    
+                    # Try this path
+                    if search_from_position(
+                        (new_row, new_col), 
+                        remaining[1:], 
+                        used_positions + [(new_row, new_col)]):
+                        return True
+        
+        # If we get here, no path worked
+        return False
+    
+    # Try each possible starting position
+    start_positions = find_starting_positions(word[0])
+    for pos in start_positions:
+        if search_from_position(pos, word[1:], [pos]):
+            return True
+    
+    # If we get here, no valid path was found
+    return False
+
+
+
+def uniform_grid(size, letter='a', corners=None):
+    """A size x size board of one repeated letter, optionally with a different letter in two corners"""
+    grid = [[letter] * size for _ in range(size)]
+    if corners:
+        grid[0][0] = grid[-1][-1] = corners
+    return grid
+
+
+CASES = [
+    # (description, grid, word, run the legacy search too)
+    ('4x4 distinct letters, real word', [list('cate'), list('rslo'), list('bdnu'), list('fghi')], 'cats', True),
+    ('4x4 all a, missing letter', uniform_grid(4), 'a' * 7 + 'b', True),
+    ('4x4 all a, 14-letter path', uniform_grid(4, corners='b'), 'b' + 'a' * 13, True),
+    ('4x4 all a, unreachable tail', uniform_grid(4, corners='b'), 'a' * 7 + 'bb', True),
+    ('5x5 all a, unreachable tail', uniform_grid(5, corners='b'), 'a' * 10 + 'bb', False),
+    ('6x6 all a, unreachable tail', uniform_grid(6, corners='b'), 'a' * 10 + 'bb', False),
+    ('5x5 all a, corner to corner', uniform_grid(5, corners='b'), 'b' + 'a' * 20 + 'b', False),
+    ('6x6 all a, corner to corner', uniform_grid(6, corners='b'), 'b' + 'a' * 30 + 'b', False),
+]
+
+
+def bench(func, number):
+    return min(timeit.repeat(func, number=number, repeat=3)) / number
+
+
+def main():
+    print(f"{'case':<34} {'result':>7} {'bitmask':>12} {'legacy':>12} {'speedup':>9}")
+    for description, grid, word, run_legacy in CASES:
+        result = is_word_in_grid(word, grid)
+        index = GridSearch(grid)
+        new_time = bench(lambda: index.contains(word), 20)
+
+        if run_legacy:
+            assert legacy_is_word_in_grid(word, grid) == result
+            old_time = bench(lambda: legacy_is_word_in_grid(word, grid), 1)
+            legacy, speedup = f"{old_time * 1e3:9.3f} ms", f"{old_time / new_time:8.1f}x"
+        else:
+            legacy, speedup = f"{'(skipped)':>12}", ''
+
+        print(f"{description:<34} {str(result):>7} {new_time * 1e3:9.3f} ms {legacy} {speedup:>9}")
+
+
+if __name__ == '__main__':
+    main()
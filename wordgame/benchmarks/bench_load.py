@@ -0,0 +1,412 @@
+"""Load test: bot players against the Socket.IO servers and the REST server.
+
+    python benchmarks/bench_load.py --server socket asyncio simple --bots 1000 --room-size 4
+
+Starts each server (gunicorn for wsgi.py and simple_app.py, uvicorn for
+asgi.py) on a free port, or uses --url, then runs --bots players in rooms of
+--room-size for --duration seconds. The first bot
+of each room creates it and the rest join; once a round starts every bot
+submits a word every --think seconds, drawn from the board's solutions or,
+with probability --noise, a string that is not on the board. When a round
+ends the room's creator restarts it. Rounds last --round-seconds. REST bots
+behave like the simple client: they follow the room through the /api/events
+long-poll and send the words typed within 150 ms of each other to
+/api/submit_words together.
+
+Reports p50/p99 latency and throughput per operation (connect, create_game,
+join_game, submit_word or, for the REST server, submit_words and events,
+whose latency is mostly the time spent waiting for a change), rounds played,
+and memory per room: the store's own estimate from /api/stats and the growth
+of the server's resident memory divided by the rooms open.
+
+Needs gunicorn, uvicorn, requests and python-socketio[client]; memory growth
+is only measured on Linux for servers this script starts.
+"""
+import argparse
+import os
+import random
+import socket
+import string
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import requests
+import socketio
+
+from engine import load_dictionary, solve_grid
+
+# Words a REST bot types within this many seconds of the first go in one batch, as in the simple client
+SUBMIT_WINDOW = 0.15
+
+# Command starting each server on a port
+SERVERS = {
+    'socket': lambda port: ['gunicorn', '-c', 'gunicorn.conf.py', '-b', f"127.0.0.1:{port}", 'wsgi:app'],
+    'asyncio': lambda port: ['uvicorn', 'asgi:app', '--port', str(port), '--ws', 'wsproto', '--log-level', 'warning'],
+    'simple': lambda port: ['gunicorn', '-c', 'gunicorn.conf.py', '-b', f"127.0.0.1:{port}", 'simple_app:app']
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Nothing listening on port {port}")
+
+
+def tree_rss(pid):
+    """Resident memory in bytes of a process and its children (Linux only, else None)"""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            rss = next(int(line.split()[1]) * 1024 for line in status if line.startswith('VmRSS:'))
+        children = []
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children") as f:
+                children.extend(int(child) for child in f.read().split())
+    except (OSError, StopIteration):
+        return None
+    return rss + sum(tree_rss(child) or 0 for child in children)
+
+
+class Server:
+    """One instance of a game server on a free port"""
+
+    def __init__(self, kind, round_seconds, threads):
+        port = free_port()
+        # Bots may submit faster than a person, so rate limiting is off: every word gets checked
+        env = dict(os.environ, ROUND_SECONDS=str(round_seconds), GUNICORN_THREADS=str(threads),
+                   ASGI_THREADS=str(threads), WORD_RATE='0')
+        self.process = subprocess.Popen(
+            SERVERS[kind](port), cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self.url = f"http://127.0.0.1:{port}"
+        wait_for_port(port)
+
+    def rss(self):
+        return tree_rss(self.process.pid)
+
+    def close(self):
+        self.process.terminate()
+        self.process.wait()
+
+
+class Stats:
+    """Latencies per operation, shared by every bot"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.rounds = 0
+        self.lock = threading.Lock()
+
+    def record(self, operation, seconds):
+        with self.lock:
+            self.latencies[operation].append(seconds)
+
+    def error(self, operation):
+        with self.lock:
+            self.errors[operation] += 1
+
+    def round_started(self):
+        with self.lock:
+            self.rounds += 1
+
+    def report(self, duration):
+        print(f"  {'operation':<12} {'count':>8} {'errors':>7} {'ops/s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+        for operation in sorted(self.latencies.keys() | self.errors.keys()):
+            latencies = sorted(self.latencies[operation])
+            if latencies:
+                p50 = latencies[len(latencies) // 2] * 1e3
+                p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1e3
+            else:
+                p50 = p99 = float('nan')
+            print(f"  {operation:<12} {len(latencies):>8} {self.errors[operation]:>7} "
+                  f"{len(latencies) / duration:>8.1f} {p50:>8.1f} {p99:>8.1f}")
+        total = sum(len(latencies) for latencies in self.latencies.values())
+        print(f"  {total / duration:.1f} requests/s in total, {self.rounds} rounds played")
+
+
+class Words:
+    """Solutions of every board seen, solved once and shared by all bots"""
+
+    def __init__(self, noise):
+        self.dictionary = load_dictionary()
+        self.noise = noise
+        self.solutions = {}
+        self.lock = threading.Lock()
+
+    def plan(self, grid):
+        """The words a bot will submit on a board, in order"""
+        key = tuple(map(tuple, grid))
+        with self.lock:
+            solutions = self.solutions.get(key)
+            if solutions is None:
+                solutions = self.solutions[key] = sorted(solve_grid(grid, self.dictionary))
+        words = random.sample(solutions, len(solutions))
+        # Mix in words that are not on the board
+        for _ in range(int(len(words) * self.noise / (1 - self.noise)) if self.noise < 1 else 100):
+            noise = ''.join(random.choices(string.ascii_lowercase, k=random.randint(3, 7)))
+            words.insert(random.randint(0, len(words)), noise)
+        return words
+
+
+class Room:
+    """Hands the code of a room from the bot that creates it to the ones that join"""
+
+    def __init__(self, size):
+        self.size = size
+        self.code = None
+        self.ready = threading.Event()
+
+
+class RestBot:
+    """A simple-mode player following its room through the /api/events long-poll"""
+
+    def __init__(self, url, room, host, stats, words, think):
+        self.url = url
+        self.room = room
+        self.host = host
+        self.stats = stats
+        self.words = words
+        self.think = think
+        self.plan = []
+        self.end_time = None
+        self.playing = threading.Event()
+        self.session = requests.Session()
+
+    def call(self, operation, method, path, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, self.url + path, timeout=30, **kwargs)
+            data = response.json()
+        except (requests.RequestException, ValueError):
+            self.stats.error(operation)
+            return None
+        self.stats.record(operation, time.perf_counter() - started)
+        if response.status_code != 200:
+            self.stats.error(operation)
+            return None
+        return data
+
+    def run(self, deadline):
+        if self.host:
+            data = self.call('create_game', 'POST', '/api/create_game',
+                             json={'name': 'host', 'max_players': self.room.size})
+            self.room.code = data and data['room_code']
+            self.room.ready.set()
+        elif not self.room.ready.wait(30) or self.room.code is None:
+            return
+        else:
+            self.call('join_game', 'POST', '/api/join_game', json={'room_code': self.room.code, 'name': 'guest'})
+
+        threading.Thread(target=self.follow_room, args=(deadline,), daemon=True).start()
+        batch = []
+        flush_at = next_word = time.time()
+        while time.time() < deadline:
+            now = time.time()
+            if now >= next_word:
+                if self.playing.is_set() and self.plan:
+                    if not batch:
+                        flush_at = now + SUBMIT_WINDOW
+                    batch.append(self.plan.pop())
+                next_word = now + self.think
+            if batch and now >= flush_at:
+                self.call('submit_words', 'POST', '/api/submit_words', json={'words': batch})
+                batch = []
+            wake = min(next_word, flush_at) if batch else next_word
+            time.sleep(max(0, min(wake, deadline) - time.time()))
+
+    def follow_room(self, deadline):
+        """Long-poll /api/events, passing back the version token, until the room closes"""
+        version = ''
+        while time.time() < deadline:
+            data = self.call('events', 'GET', '/api/events', params={'since': version})
+            # A poll held past the end of the run is not acted on
+            if data is None or time.time() >= deadline:
+                return
+            version = data['version']
+            status = data.get('status')
+            if status and status['status'] == 'playing' and status['end_time'] != self.end_time:
+                self.end_time = status['end_time']
+                self.plan = self.words.plan(status['grid'])
+                self.playing.set()
+                if self.host:
+                    self.stats.round_started()
+            elif status and status['status'] == 'finished':
+                self.playing.clear()
+                if self.host:
+                    self.call('restart_game', 'POST', '/api/restart_game')
+            # The server had no thread free to hold the request
+            time.sleep(data.get('retry_after', 0))
+
+
+class SocketBot:
+    """A real-time player; replies arrive in order, so each is timed against the oldest request"""
+
+    def __init__(self, url, room, host, stats, words, think):
+        self.room = room
+        self.host = host
+        self.stats = stats
+        self.words = words
+        self.think = think
+        self.plan = []
+        self.playing = threading.Event()
+        self.pending = defaultdict(deque)
+        self.client = socketio.Client()
+        self.client.on('game_created', self._on_created)
+        self.client.on('game_joined', lambda data: self._reply('join_game'))
+        self.client.on('game_started', self._on_started)
+        self.client.on('word_result', lambda data: self._reply('submit_word'))
+        self.client.on('game_ended', self._on_ended)
+        self.client.on('error', self._on_error)
+
+        # A threaded server only holds as many connections as it has threads
+        started = time.perf_counter()
+        try:
+            self.client.connect(url, transports=['websocket'], wait_timeout=10)
+        except socketio.exceptions.ConnectionError:
+            self.stats.error('connect')
+            self.connected = False
+        else:
+            self.stats.record('connect', time.perf_counter() - started)
+            self.connected = True
+
+    def send(self, operation, event, data):
+        self.pending[operation].append(time.perf_counter())
+        self.client.emit(event, data)
+
+    def _reply(self, operation):
+        if self.pending[operation]:
+            self.stats.record(operation, time.perf_counter() - self.pending[operation].popleft())
+
+    def _on_created(self, data):
+        self._reply('create_game')
+        self.room.code = data['room_code']
+        self.room.ready.set()
+
+    def _on_started(self, data):
+        self.plan = self.words.plan(data['grid'])
+        self.playing.set()
+        if self.host:
+            self.stats.round_started()
+
+    def _on_ended(self, data):
+        self.playing.clear()
+        if self.host and not data.get('reason'):
+            self.client.emit('restart_game', {})
+
+    def _on_error(self, data):
+        # Errors answer the oldest outstanding request, most likely a submission
+        for operation in ('submit_word', 'join_game', 'create_game'):
+            if self.pending[operation]:
+                self.pending[operation].popleft()
+                self.stats.error(operation)
+                return
+
+    def run(self, deadline):
+        if not self.connected:
+            if self.host:
+                self.room.ready.set()
+            return
+        if self.host:
+            self.send('create_game', 'create_game', {'name': 'host', 'max_players': self.room.size})
+        elif not self.room.ready.wait(30) or self.room.code is None:
+            return
+        else:
+            self.send('join_game', 'join_game', {'room_code': self.room.code, 'name': 'guest'})
+
+        while time.time() < deadline:
+            if self.playing.wait(max(0, min(1, deadline - time.time()))) and self.plan:
+                self.send('submit_word', 'submit_word', {'word': self.plan.pop()})
+                time.sleep(self.think)
+
+    def close(self):
+        if self.connected:
+            self.client.disconnect()
+
+
+def run_bots(kind, url, args, stats, server=None):
+    words = Words(args.noise)
+    seats = []
+    for i in range(0, args.bots, args.room_size):
+        room = Room(min(args.room_size, args.bots - i))
+        seats.extend((room, j == 0) for j in range(room.size))
+    rooms = -(-args.bots // args.room_size)
+
+    base_rss = server.rss() if server else None
+    # Socket bots connect as they are created, so create them in parallel
+    bot_class = RestBot if kind == 'simple' else SocketBot
+    with ThreadPoolExecutor(max_workers=64) as pool:
+        bots = list(pool.map(lambda seat: bot_class(url, *seat, stats, words, args.think), seats))
+    deadline = time.time() + args.duration
+    threads = [threading.Thread(target=bot.run, args=(deadline,), daemon=True) for bot in bots]
+    for thread in threads:
+        thread.start()
+
+    # Measure memory once the rooms have filled up, before any bot leaves
+    time.sleep(min(args.duration / 2, 10))
+    try:
+        room_stats = requests.get(url + '/api/stats', timeout=10).json()
+    except requests.RequestException:
+        # A threaded server with every thread holding a websocket cannot answer
+        room_stats = {}
+    peak_rss = server.rss() if server else None
+
+    for thread in threads:
+        thread.join()
+    if bot_class is SocketBot:
+        for bot in bots:
+            bot.close()
+
+    if room_stats.get('bytes_per_room') is not None:
+        print(f"  store: {room_stats['live_rooms']} rooms, {room_stats['bytes_per_room']:.0f} bytes per room")
+    if base_rss is not None and peak_rss is not None:
+        print(f"  server memory: {(peak_rss - base_rss) / rooms / 1024:.1f} KiB per room "
+              f"(including connections)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bot load test for the game servers')
+    parser.add_argument('--server', nargs='+', choices=sorted(SERVERS), default=['socket', 'asyncio', 'simple'])
+    parser.add_argument('--url', help='Use a running server instead of starting one (one --server only)')
+    parser.add_argument('--bots', type=int, default=200)
+    parser.add_argument('--room-size', type=int, default=2)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--round-seconds', type=float, default=10)
+    parser.add_argument('--think', type=float, default=0.5, help='Seconds between a bot\'s submissions')
+    parser.add_argument('--noise', type=float, default=0.5, help='Share of submissions not on the board')
+    parser.add_argument('--threads', type=int, default=200, help='Gunicorn threads (or asyncio server threads) for servers started here')
+    args = parser.parse_args()
+    if args.url and len(args.server) != 1:
+        parser.error('--url needs exactly one --server')
+
+    for kind in args.server:
+        print(f"{kind} server: {args.bots} bots in rooms of {args.room_size} for {args.duration:.0f}s")
+        server = None if args.url else Server(kind, args.round_seconds, args.threads)
+        stats = Stats()
+        try:
+            run_bots(kind, args.url or server.url, args, stats, server)
+        finally:
+            if server:
+                server.close()
+        stats.report(args.duration)
+        print()
+
+
+if __name__ == '__main__':
+    main()
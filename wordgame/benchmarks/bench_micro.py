@@ -0,0 +1,96 @@
+"""Microbenchmarks of the game's hot paths, with a regression check for CI.
+
+    python benchmarks/bench_micro.py --save baseline.json
+    python benchmarks/bench_micro.py --compare baseline.json --tolerance 0.25
+
+Times grid search (is_word_in_grid and GridSearch), generate_grid, dictionary
+lookups, solving a board, scoring and building the client word filter, and
+prints microseconds per call. --compare exits with status 1 if any case is
+more than --tolerance slower than in the saved baseline, so a slow change can
+be caught before deploy; baselines are only comparable on the same machine.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import (GridSearch, build_word_filter, calculate_score, generate_grid, is_word_in_grid,
+                    load_dictionary, solve_grid)
+
+english_words = load_dictionary()
+
+# A fixed board and words so runs are comparable
+random.seed(7)
+GRID = generate_grid()
+SOLUTIONS = sorted(solve_grid(GRID, english_words))
+HIT = max(SOLUTIONS, key=len)
+MISS = HIT[:-1] + ('q' if HIT[-1] != 'q' else 'z')
+MISSING = [word + 'xq' for word in SOLUTIONS[:50]]
+
+
+def cases():
+    search = GridSearch(GRID)
+    return {
+        'is_word_in_grid hit': lambda: is_word_in_grid(HIT, GRID),
+        'is_word_in_grid miss': lambda: is_word_in_grid(MISS, GRID),
+        'GridSearch build': lambda: GridSearch(GRID),
+        'GridSearch hit': lambda: search.contains(HIT),
+        'GridSearch miss': lambda: search.contains(MISS),
+        'generate_grid': generate_grid,
+        'dictionary hit x50': lambda: [word in english_words for word in SOLUTIONS[:50]],
+        'dictionary miss x50': lambda: [word in english_words for word in MISSING],
+        'solve_grid': lambda: solve_grid(GRID, english_words),
+        'calculate_score x50': lambda: [calculate_score(word) for word in SOLUTIONS[:50]],
+        'build_word_filter': lambda: build_word_filter(SOLUTIONS)
+    }
+
+
+def measure(func):
+    """Best of five runs of at least 0.2 seconds, in microseconds per call"""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=5, number=number)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Hot path microbenchmarks')
+    parser.add_argument('--save', help='Write the results to this JSON file')
+    parser.add_argument('--compare', help='Compare against results saved earlier')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed slowdown, as a fraction')
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    print(f"board {''.join(''.join(row) for row in GRID)}: {len(SOLUTIONS)} words, longest {HIT!r}")
+    print(f"{'case':<24} {'us/call':>10} {'baseline':>10} {'change':>8}")
+    results = {}
+    regressions = []
+    for name, func in cases().items():
+        results[name] = measure(func)
+        line = f"{name:<24} {results[name]:>10.2f}"
+        if name in baseline:
+            change = results[name] / baseline[name] - 1
+            line += f" {baseline[name]:>10.2f} {change:>+8.0%}"
+            if change > args.tolerance:
+                regressions.append(name)
+                line += '  SLOWER'
+        print(line)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if regressions:
+        print(f"\n{len(regressions)} case(s) slower than the baseline by more than {args.tolerance:.0%}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
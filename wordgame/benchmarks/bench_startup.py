@@ -0,0 +1,128 @@
+"""Startup time of the WSGI entry points, from launch to first response.
+
+    python benchmarks/bench_startup.py --runs 5
+
+For wsgi.py (the real-time app) and simple_app.py, measures:
+
+- import: importing the module in a fresh interpreter, which every gunicorn
+  worker pays unless the app is preloaded
+- first response: from starting gunicorn (gunicorn.conf.py) until GET /
+  answers, with GUNICORN_PRELOAD off and on
+- respawn: from killing the worker until its replacement answers, which with
+  preloading is only a fork
+
+Prints the median and best of --runs for each. Needs gunicorn; respawn is only
+measured on Linux, where the worker can be found through /proc.
+"""
+import argparse
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Module and gunicorn app of each entry point
+ENTRY_POINTS = {
+    'wsgi': ('wsgi', 'wsgi:app'),
+    'simple': ('simple_app', 'simple_app:app')
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for_response(url, timeout=60):
+    """Seconds until url answers 200"""
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        try:
+            with urllib.request.urlopen(url, timeout=0.5) as response:
+                if response.status == 200:
+                    return time.perf_counter() - started
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.01)
+    raise RuntimeError(f"No response from {url}")
+
+
+def worker_pid(master_pid):
+    """The gunicorn worker forked by master_pid (Linux only, else None)"""
+    try:
+        with open(f"/proc/{master_pid}/task/{master_pid}/children") as f:
+            children = [int(pid) for pid in f.read().split()]
+    except OSError:
+        return None
+    return children[0] if children else None
+
+
+def time_import(module, env):
+    code = f"import time; started = time.perf_counter(); import {module}; print(time.perf_counter() - started)"
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, check=True,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    return float(result.stdout.split()[-1])
+
+
+def time_server(app, env, preload):
+    """Seconds from launching gunicorn to the first response, and to a respawned worker's first response"""
+    port = free_port()
+    url = f"http://127.0.0.1:{port}/"
+    env = dict(env, GUNICORN_PRELOAD='1' if preload else '0')
+    started = time.perf_counter()
+    process = subprocess.Popen(['gunicorn', '-c', 'gunicorn.conf.py', '-b', f"127.0.0.1:{port}", app],
+                               cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_response(url)
+        first = time.perf_counter() - started
+
+        respawn = None
+        worker = worker_pid(process.pid)
+        if worker is not None:
+            os.kill(worker, signal.SIGKILL)
+            respawn = wait_for_response(url)
+        return first, respawn
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def summary(samples):
+    samples = [sample for sample in samples if sample is not None]
+    if not samples:
+        return f"{'-':>10} {'-':>10}"
+    return f"{statistics.median(samples) * 1000:>8.0f}ms {min(samples) * 1000:>8.0f}ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Startup time of the WSGI entry points')
+    parser.add_argument('--entry', nargs='+', choices=sorted(ENTRY_POINTS), default=sorted(ENTRY_POINTS))
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    # Keep the benchmark's rounds out of the real match history
+    history = tempfile.TemporaryDirectory()
+    env = dict(os.environ, HISTORY_DB=os.path.join(history.name, 'history.db'))
+
+    print(f"{'entry point':<34} {'median':>10} {'best':>10}")
+    for entry in args.entry:
+        module, app = ENTRY_POINTS[entry]
+        imports = [time_import(module, env) for _ in range(args.runs)]
+        print(f"{entry + ' import':<34} {summary(imports)}")
+        for preload in (False, True):
+            runs = [time_server(app, env, preload) for _ in range(args.runs)]
+            mode = 'preload' if preload else 'no preload'
+            print(f"{f'{entry} first response, {mode}':<34} {summary([first for first, _ in runs])}")
+            print(f"{f'{entry} respawn, {mode}':<34} {summary([respawn for _, respawn in runs])}")
+    history.cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""Benchmark: one RoundTimers heap vs. one sleeping thread per round.
+
+    python benchmarks/bench_timers.py [--rooms 50000] [--spread 10] [--restarts 3]
+
+Schedules --rooms round ends spread over --spread seconds, restarting each
+room --restarts times first (so stale timers pile up the way they did with
+one background task per round), then waits for them all to fire. Reports
+memory held while the timers are pending, CPU time, how late the callbacks
+ran, and how many times a room was ended. The baseline starts one
+threading.Timer per round, as the old per-game background task did, for a
+smaller room count since every one of them is an OS thread.
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from timers import RoundTimers
+
+# Deadlines start this far out so none fall due while they are being scheduled
+SETUP_TIME = 5
+
+
+class Recorder:
+    def __init__(self, expected):
+        self.fired = Counter()
+        self.lateness = []
+        self.deadlines = {}
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        self.expected = expected
+
+    def __call__(self, room):
+        now = time.time()
+        with self.lock:
+            self.fired[room] += 1
+            self.lateness.append(now - self.deadlines[room])
+            if len(self.lateness) >= self.expected:
+                self.done.set()
+
+
+def run_scheduler(rooms, spread, restarts):
+    recorder = Recorder(rooms)
+    tracemalloc.start()
+    timers = RoundTimers(recorder)
+    timers.start()
+
+    cpu = time.process_time()
+    start = time.time() + SETUP_TIME
+    for restart in range(restarts + 1):
+        for room in range(rooms):
+            deadline = start + spread * room / rooms + restart * 0.001
+            recorder.deadlines[room] = deadline
+            timers.schedule(room, deadline)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    recorder.done.wait(SETUP_TIME + spread + 30)
+    time.sleep(0.5)
+    return recorder, memory, time.process_time() - cpu
+
+
+def run_threads(rooms, spread, restarts):
+    recorder = Recorder(rooms * (restarts + 1))
+    tracemalloc.start()
+    cpu = time.process_time()
+    start = time.time() + SETUP_TIME
+    threads = []
+    for restart in range(restarts + 1):
+        for room in range(rooms):
+            deadline = start + spread * room / rooms + restart * 0.001
+            recorder.deadlines[room] = deadline
+            timer = threading.Timer(deadline - time.time(), recorder, (room,))
+            timer.start()
+            threads.append(timer)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    for timer in threads:
+        timer.join()
+    return recorder, memory, time.process_time() - cpu
+
+
+def report(name, rooms, recorder, memory, cpu):
+    lateness = sorted(recorder.lateness) or [float('nan')]
+    p50 = statistics.median(lateness) * 1e3
+    p99 = lateness[min(len(lateness) - 1, int(len(lateness) * 0.99))] * 1e3
+    extra = sum(count - 1 for count in recorder.fired.values())
+    print(f"{name:<12} {rooms:>7} {memory / rooms:>10.0f} {cpu:>8.2f} {p50:>8.1f} {p99:>8.1f} {extra:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Round timer scheduler benchmark')
+    parser.add_argument('--rooms', type=int, default=50000)
+    parser.add_argument('--thread-rooms', type=int, default=2000, help='Rooms for the thread-per-round baseline')
+    parser.add_argument('--spread', type=float, default=10, help='Seconds over which deadlines are spread')
+    parser.add_argument('--restarts', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'':<12} {'rooms':>7} {'bytes/room':>10} {'cpu s':>8} {'p50 ms':>8} {'p99 ms':>8} {'extra ends':>10}")
+    for rooms in sorted({args.rooms // 10, args.rooms}):
+        report('heap', rooms, *run_scheduler(rooms, args.spread, args.restarts))
+    if args.thread_rooms:
+        report('thread/round', args.thread_rooms, *run_threads(args.thread_rooms, args.spread, args.restarts))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+"""Compile the English word list into the memory-mapped dictionary artifact.
+
+Run this once per deploy, before the server workers start:
+
+    python build_dictionary.py
+
+Workers then map the artifact read-only and never import nltk themselves.
+"""
+import argparse
+import os
+import time
+
+from engine.dictionary import DEFAULT_PATH, compile_words, nltk_words
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the compiled word list used by the game servers')
+    parser.add_argument('--output', default=DEFAULT_PATH, help='Where to write the artifact')
+    parser.add_argument('--source', help='Plain text word list (one word per line) instead of the NLTK corpus')
+    parser.add_argument('--force', action='store_true', help='Rebuild even if the artifact already exists')
+    args = parser.parse_args()
+
+    if os.path.exists(args.output) and not args.force:
+        print(f"{args.output} already exists, skipping (use --force to rebuild)")
+        return
+
+    start = time.time()
+    if args.source:
+        with open(args.source) as f:
+            words = [line.strip() for line in f]
+    else:
+        words = nltk_words()
+
+    count = compile_words(words, args.output)
+    size = os.path.getsize(args.output)
+    print(f"Wrote {count} words ({size / 1024:.0f} KiB) to {args.output} in {time.time() - start:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
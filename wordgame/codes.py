@@ -0,0 +1,55 @@
+import hashlib
+import os
+import string
+
+ALPHABET = string.ascii_uppercase
+
+
+class RoomCodes:
+    """Maps a sequence number to a room code, visiting every code exactly once
+
+    Position n of the sequence is turned into a code with a small keyed
+    Feistel permutation (cycle-walking back into range), so consecutive rooms
+    get unrelated codes and the next code cannot be guessed from the last one
+    without the key. The first `size` positions are every code of `length`
+    letters; later positions continue with every code one letter longer, and so
+    on, so the code space never runs out. Each lookup is a few hashes.
+    """
+
+    ROUNDS = 4
+
+    def __init__(self, length=None, key=None):
+        self.length = length if length is not None else int(os.getenv('ROOM_CODE_LENGTH', 4))
+        key = key if key is not None else os.getenv('SECRET_KEY', 'dev_key')
+        self.key = hashlib.sha256(key.encode()).digest()[:16]
+        self.size = len(ALPHABET) ** self.length
+
+    def code(self, position):
+        """Return the room code at position in the sequence"""
+        length, size = self.length, self.size
+        while position >= size:
+            position -= size
+            length += 1
+            size *= len(ALPHABET)
+
+        index = self._permute(position, size)
+        letters = []
+        for _ in range(length):
+            index, digit = divmod(index, len(ALPHABET))
+            letters.append(ALPHABET[digit])
+        return ''.join(letters)
+
+    def _permute(self, value, size):
+        # Feistel network over the smallest even number of bits covering size;
+        # values that land outside the range are permuted again until they fit
+        half = ((size - 1).bit_length() + 1) // 2
+        mask = (1 << half) - 1
+        while True:
+            left, right = value >> half, value & mask
+            for round_number in range(self.ROUNDS):
+                digest = hashlib.blake2b(f"{size}:{round_number}:{right}".encode(),
+                                         key=self.key, digest_size=8).digest()
+                left, right = right, left ^ (int.from_bytes(digest, 'big') & mask)
+            value = left << half | right
+            if value < size:
+                return value
@@ -0,0 +1,22 @@
+"""The game core shared by every front end: dictionary, boards, solver and scoring
+
+    dictionary  memory-mapped word list, loaded once per process
+    gridsearch  checking a single word against a grid
+    solver      every dictionary word on a grid
+    boards      seeded board generation, vetting and the background pool
+    scoring     word scores and end-of-round settlement
+    rounds      checking and recording submitted words, finishing and replaying a round
+    wordfilter  the Bloom filter of a board's words sent to clients
+    batchsolver solving boards in bulk with NumPy, for offline analytics only
+                (needs numpy, so it is not imported here)
+
+Nothing here knows about Flask, Socket.IO or which game store is in use, so the
+real-time and simple apps stay thin adapters and any speed-up lands in both.
+"""
+from .boards import Board, BoardGenerator, BoardPool, default_board_pool, generate_grid, grid_from_seed
+from .dictionary import Dictionary, load_dictionary
+from .gridsearch import GridSearch, is_word_in_grid
+from .rounds import finish_round, record_words, replay_round
+from .scoring import calculate_score, determine_winners, settle_round
+from .solver import solve_grid
+from .wordfilter import build_word_filter, might_contain
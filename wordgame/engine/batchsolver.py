@@ -0,0 +1,173 @@
+"""Solving many boards at once with NumPy, for offline board analytics
+
+Needs numpy, which the game servers do not, so the engine package does not
+import this module; analyze_boards.py does.
+
+Boards are rows of a uint8 array holding letter numbers (0 is 'a'), one row
+per board in reading order. Instead of walking each board cell by cell, every
+board in a batch is searched one path length at a time: the frontier of all
+live paths on all boards is a set of parallel arrays, and each step extends
+every path to each neighbouring cell at once, keeping those that still spell
+a prefix in the dictionary trie.
+"""
+import numpy as np
+
+from .gridsearch import grid_neighbors
+from .scoring import calculate_score
+
+LETTERS = 26
+# Number of bits set in every 13-bit value, half a letter mask
+BITS_SET = np.array([bin(value).count('1') for value in range(1 << 13)], dtype=np.int64)
+
+
+def grids_to_array(grids):
+    """Lists of letter rows -> (boards, cells) uint8 array"""
+    letters = ''.join(letter for grid in grids for row in grid for letter in row)
+    cells = len(grids[0]) * len(grids[0][0]) if grids else 0
+    return (np.frombuffer(letters.encode('ascii'), dtype=np.uint8) - ord('a')).reshape(len(grids), cells)
+
+
+def array_to_grid(board, cols):
+    letters = [chr(ord('a') + letter) for letter in board.tolist()]
+    return [letters[i:i + cols] for i in range(0, len(letters), cols)]
+
+
+class Trie:
+    """The dictionary as a prefix trie, in arrays
+
+    Nodes are numbered from 0 (the root) so that the children of each node are
+    numbered consecutively in letter order. letters[n] is a bitmask of the
+    letters node n has children for and first[n] the number of its first
+    child, so the child on a letter is first[n] plus the number of lower
+    letters in the mask: two lookups per step, and about 12 bytes per node
+    where a 26-wide child table would take over 100. word[n] is the
+    dictionary index of the word ending at node n, or -1; words longer than
+    max_length are left out.
+    """
+
+    def __init__(self, dictionary, max_length=16):
+        parents, letters, word = [-1], [0], [-1]
+        lengths = []
+        path = [0]
+        previous = ''
+        for index, text in enumerate(dictionary):
+            lengths.append(len(text))
+            if len(text) > max_length:
+                continue
+            # Sorted order means this word shares a prefix with the previous one kept
+            common = 0
+            while common < len(previous) and common < len(text) and previous[common] == text[common]:
+                common += 1
+            del path[common + 1:]
+            node = path[common]
+            for letter in text[common:]:
+                parents.append(node)
+                letters.append(ord(letter) - ord('a'))
+                word.append(-1)
+                node = len(word) - 1
+                path.append(node)
+            word[node] = index
+            previous = text
+
+        # Renumber the nodes in order of (parent, letter), which groups siblings
+        parents, letters = np.array(parents, dtype=np.int64), np.array(letters, dtype=np.int64)
+        order = np.argsort(parents[1:] * LETTERS + letters[1:], kind='stable') + 1
+        number = np.zeros(len(parents), dtype=np.int64)
+        number[order] = np.arange(1, len(parents))
+        parents = number[parents[order]]
+        self.first = np.zeros(len(number), dtype=np.int32)
+        owners, firsts = np.unique(parents, return_index=True)
+        self.first[owners] = firsts + 1
+        self.letters = np.zeros(len(number), dtype=np.int32)
+        np.bitwise_or.at(self.letters, parents, np.left_shift(1, letters[order]).astype(np.int32))
+        self.word = np.full(len(number), -1, dtype=np.int32)
+        self.word[number] = word
+
+        self.word_count = len(lengths)
+        # Points per dictionary word, so a board's best score is one gather and a sum
+        self.word_scores = np.array([calculate_score('a' * length) for length in range(max(lengths, default=0) + 1)],
+                                    dtype=np.int64)[np.array(lengths, dtype=np.intp)]
+
+    def __len__(self):
+        return len(self.word)
+
+    def children(self, nodes, letters):
+        """Child of each node on the matching letter, or -1 where there is none"""
+        masks = self.letters[nodes]
+        below = masks & (np.left_shift(1, letters) - 1)
+        children = self.first[nodes] + BITS_SET[below & 0x1fff] + BITS_SET[below >> 13]
+        return np.where(masks >> letters & 1 == 1, children, -1)
+
+
+def neighbor_table(rows, cols):
+    """(cells, 8) array of each cell's neighbours, padded with -1"""
+    neighbors = grid_neighbors(rows, cols)
+    table = np.full((rows * cols, max(len(cell) for cell in neighbors)), -1, dtype=np.int64)
+    for cell, adjacent in enumerate(neighbors):
+        table[cell, :len(adjacent)] = adjacent
+    return table
+
+
+def solve_boards(trie, boards, rows, cols):
+    """Find every word on each board of a batch
+
+    Returns (board, word, length) arrays with one entry per distinct word
+    found on a board; word is the dictionary index. Paths may not reuse a
+    cell, as in solver.py, so the results match solve_grid.
+    """
+    boards = np.asarray(boards, dtype=np.uint8)
+    count, cells = boards.shape
+    letters = boards.reshape(-1).astype(np.int64)
+    neighbors = neighbor_table(rows, cols)
+
+    # The frontier: one entry per live path, by board, last cell, cells used and trie node
+    board = np.repeat(np.arange(count, dtype=np.int64), cells)
+    cell = np.tile(np.arange(cells, dtype=np.int64), count)
+    node = trie.children(np.zeros(count * cells, dtype=np.int64), letters)
+    live = node >= 0
+    board, cell, node = board[live], cell[live], node[live]
+    visited = np.left_shift(1, cell)
+
+    found_board, found_word, found_length = [], [], []
+    length = 1
+    while board.size:
+        word = trie.word[node]
+        hit = word >= 0
+        if hit.any():
+            found_board.append(board[hit])
+            found_word.append(word[hit])
+            found_length.append(np.full(int(hit.sum()), length, dtype=np.int32))
+
+        parts = []
+        for slot in range(neighbors.shape[1]):
+            nxt = neighbors[cell, slot]
+            ok = nxt >= 0
+            ok[ok] = (visited[ok] >> nxt[ok]) & 1 == 0
+            b, n, v, parent = board[ok], nxt[ok], visited[ok], node[ok]
+            child = trie.children(parent, letters[b * cells + n])
+            keep = child >= 0
+            parts.append((b[keep], n[keep], v[keep] | np.left_shift(1, n[keep]), child[keep]))
+        board, cell, visited, node = (np.concatenate(column) for column in zip(*parts))
+        length += 1
+
+    if not found_board:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty.astype(np.int32)
+    board, word, length = np.concatenate(found_board), np.concatenate(found_word), np.concatenate(found_length)
+    # The same word can be traced along more than one path
+    _, first = np.unique(board * trie.word_count + word, return_index=True)
+    return board[first], word[first], length[first]
+
+
+def board_stats(trie, boards, rows, cols):
+    """Word count, best possible score and words of each length, per board
+
+    Returns (words, max_scores, lengths) where lengths[i, n] is how many
+    words of n letters board i has.
+    """
+    count, cells = np.shape(boards)
+    board, word, length = solve_boards(trie, boards, rows, cols)
+    words = np.bincount(board, minlength=count)
+    max_scores = np.bincount(board, weights=trie.word_scores[word], minlength=count).astype(np.int64)
+    lengths = np.bincount(board * (cells + 1) + length, minlength=count * (cells + 1)).reshape(count, cells + 1)
+    return words, max_scores, lengths
@@ -0,0 +1,277 @@
+import atexit
+import multiprocessing
+import os
+import random
+import string
+import sys
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import FIRST_COMPLETED, CancelledError, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from itertools import repeat
+from multiprocessing.connection import wait as wait_for_exit
+
+from .dictionary import load_dictionary
+from .scoring import calculate_score
+from .solver import solve_grid
+from .wordfilter import build_word_filter
+
+# A playable board. solutions is None when the board could not be solved within
+# its time budget, in which case submissions fall back to searching the grid.
+# word_filter is the Bloom filter of the solutions sent to clients (see
+# wordfilter.py), built here so starting a round costs nothing extra. seed is
+# what the grid was generated from (see grid_from_seed), or None for a grid
+# that came from elsewhere.
+Board = namedtuple('Board', ['grid', 'solutions', 'max_score', 'word_filter', 'seed'], defaults=(None,))
+
+# Seeds are kept below 2**53 so they survive a round trip through JSON
+SEED_BITS = 48
+# Share of the grid's cells given to vowels
+VOWEL_SHARE = 0.4
+
+
+def generate_grid(size=4, rng=random, vowel_share=VOWEL_SHARE):
+    """Generate a random grid of letters with no duplicates, drawing from rng"""
+    # Include more vowels to make grid more playable
+    vowels = 'aeiou'
+    consonants = ''.join(c for c in string.ascii_lowercase if c not in vowels)
+    
+    # Create a list of all available letters
+    all_letters = list(string.ascii_lowercase)
+    
+    # Select unique letters with preference for vowels
+    letters = []
+    # Target number of vowels (about 40% of the grid by default)
+    vowel_count = int(size*size*vowel_share)
+    
+    # First select vowels
+    available_vowels = [c for c in all_letters if c in vowels]
+    rng.shuffle(available_vowels)
+    letters.extend(available_vowels[:vowel_count])
+    
+    # Remove selected vowels from available letters
+    for letter in letters:
+        all_letters.remove(letter)
+    
+    # Fill remaining spaces with consonants or other letters
+    rng.shuffle(all_letters)
+    letters.extend(all_letters[:size*size - len(letters)])
+    
+    # Shuffle and reshape into grid
+    rng.shuffle(letters)
+    grid = []
+    for i in range(0, size*size, size):
+        grid.append(letters[i:i+size])
+    
+    return grid
+
+
+def new_seed():
+    return random.getrandbits(SEED_BITS)
+
+
+def grid_from_seed(seed, size=4):
+    """The grid a round with this seed was played on
+
+    Every grid the generator makes comes from its seed this way, so a round
+    can be replayed from its seed alone. Changing how generate_grid draws
+    letters changes the grid of every archived seed.
+    """
+    return generate_grid(size, random.Random(seed))
+
+
+class BoardGenerator:
+    """Samples seeded grids and only accepts those with enough findable words"""
+
+    def __init__(self, generate_grid, dictionary, calculate_score,
+                 min_words=None, min_score=None, time_budget=None, max_attempts=None):
+        self.generate_grid = generate_grid
+        self.dictionary = dictionary
+        self.calculate_score = calculate_score
+        self.min_words = min_words if min_words is not None else int(os.getenv('BOARD_MIN_WORDS', 40))
+        self.min_score = min_score if min_score is not None else int(os.getenv('BOARD_MIN_SCORE', 0))
+        # Seconds allowed to solve a single candidate board
+        self.time_budget = time_budget if time_budget is not None else float(os.getenv('BOARD_TIME_BUDGET', 0.05))
+        max_attempts = max_attempts if max_attempts is not None else int(os.getenv('BOARD_MAX_ATTEMPTS', 20))
+        # generate() always needs at least one board to return
+        self.max_attempts = max(1, max_attempts)
+
+    def solve(self, grid, seed=None):
+        """Solve a grid within the time budget and wrap it as a Board"""
+        solutions = solve_grid(grid, self.dictionary, deadline=time.perf_counter() + self.time_budget)
+        if solutions is None:
+            return Board(grid, None, None, None, seed)
+        return Board(grid, solutions, sum(self.calculate_score(word) for word in solutions),
+                     build_word_filter(solutions), seed)
+
+    def is_acceptable(self, board):
+        return (board.solutions is not None and
+                len(board.solutions) >= self.min_words and
+                board.max_score >= self.min_score)
+
+    def generate(self):
+        """Return the first acceptable board, or the best one seen if none qualify"""
+        best = None
+        for _ in range(self.max_attempts):
+            seed = new_seed()
+            board = self.solve(self.generate_grid(rng=random.Random(seed)), seed)
+            if self.is_acceptable(board):
+                return board
+            if board.solutions is not None and (best is None or len(board.solutions) > len(best.solutions)):
+                best = board
+        return best or board
+
+
+# The generator of a board worker process, set when the process starts
+_worker_generator = None
+
+
+def _start_worker(generator):
+    global _worker_generator
+    _worker_generator = generator
+    threading.Thread(target=_exit_with_parent, name='parent-watch', daemon=True).start()
+
+
+def _exit_with_parent():
+    # A parent killed outright (SIGKILL, a gunicorn timeout) never shuts the
+    # executor down, so a worker leaves as soon as its parent is gone
+    wait_for_exit([multiprocessing.parent_process().sentinel])
+    os._exit(0)
+
+
+def _generate_board():
+    return _worker_generator.generate()
+
+
+class BoardPool:
+    """Queue of vetted boards kept topped up in the background
+
+    Boards are generated in `workers` separate processes (BOARD_WORKERS,
+    default 1), so solving never holds this process's interpreter lock while
+    handlers are running; with 0 workers, or if the processes cannot be
+    started or die, a background thread generates them instead. At most
+    `size` boards are ready or on the way at once, and at most one job per
+    worker is queued. get() never waits: if the pool has run dry it generates
+    a board inline instead.
+    """
+
+    def __init__(self, generator, size=None, workers=None):
+        self.generator = generator
+        self.size = size if size is not None else int(os.getenv('BOARD_POOL_SIZE', 32))
+        self.workers = workers if workers is not None else int(os.getenv('BOARD_WORKERS', 1))
+        # Boards get() had to generate because the pool was empty
+        self.inline_boards = 0
+        self._boards = deque()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._executor = None
+
+    def __len__(self):
+        return len(self._boards)
+
+    def start(self):
+        """Start the background refill thread (safe to call more than once)"""
+        # Board workers run the app's main script again (as __mp_main__, while
+        # they start up); they must not start pools of their own
+        main = sys.modules['__main__']
+        if multiprocessing.parent_process() is not None or sys.modules.get('__mp_main__', main) is not main:
+            return
+        with self._condition:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._refill, name='board-pool', daemon=True)
+                self._thread.start()
+
+    def load(self, grids, seeds=None):
+        """Add pre-generated boards, re-solving each one against the current dictionary
+
+        seeds, if given, are the seeds the grids came from (see grid_from_seed),
+        so rounds played on them can be replayed.
+        """
+        boards = [self.generator.solve(grid, seed) for grid, seed in zip(grids, seeds or repeat(None))]
+        with self._condition:
+            self._boards.extend(board for board in boards if self.generator.is_acceptable(board))
+
+    def stop(self):
+        """Shut the board workers down, dropping queued jobs (the pool then generates inline)"""
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def get(self):
+        with self._condition:
+            if self._boards:
+                board = self._boards.popleft()
+                self._condition.notify()
+                return board
+            self.inline_boards += 1
+        return self.generator.generate()
+
+    def put_back(self, board):
+        """Return an unplayed board from get() so the next round takes it"""
+        with self._condition:
+            if len(self._boards) < self.size:
+                self._boards.appendleft(board)
+
+    def _start_workers(self):
+        if self.workers <= 0:
+            return None
+        try:
+            # Spawned rather than forked, since this process has other threads running
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+                initializer=_start_worker, initargs=(self.generator,))
+        except (OSError, ValueError) as exc:
+            print(f"Could not start board workers, generating boards in this process: {exc!r}")
+            return None
+        atexit.register(self.stop)
+        return self._executor
+
+    def _refill(self):
+        executor = self._start_workers()
+        pending = set()
+        while True:
+            with self._condition:
+                while not pending and len(self._boards) >= self.size:
+                    self._condition.wait()
+                wanted = self.size - len(self._boards) - len(pending)
+
+            if executor is None:
+                board = self.generator.generate()
+                with self._condition:
+                    self._boards.append(board)
+                continue
+
+            try:
+                while wanted > 0 and len(pending) < self.workers:
+                    pending.add(executor.submit(_generate_board))
+                    wanted -= 1
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                boards = [future.result() for future in done]
+            except CancelledError:
+                # stop() was called
+                return
+            except Exception as exc:
+                # Submitting fails this way once the interpreter is exiting or stop() was called
+                if isinstance(exc, RuntimeError) and not isinstance(exc, BrokenProcessPool):
+                    return
+                print(f"Board workers failed, generating boards in this process: {exc!r}")
+                self.stop()
+                executor, pending = None, set()
+                continue
+            with self._condition:
+                self._boards.extend(boards)
+
+
+# The process's board pool, shared by every front end running in it
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def default_board_pool():
+    """The pool of boards for the default dictionary, created on first use (call start() to fill it)"""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = BoardPool(BoardGenerator(generate_grid, load_dictionary(), calculate_score))
+    return _default_pool
@@ -0,0 +1,182 @@
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+
+# Compiled dictionary layout:
+#   magic (8 bytes) | word count (uint32) | reserved (uint32)
+#   offsets (uint32 * (count + 1), absolute positions of each word in the file)
+#   word bytes, sorted, lowercase ascii, no separators
+MAGIC = b'WGDICT01'
+HEADER = struct.Struct('<8sII')
+MIN_WORD_LENGTH = 3
+
+DEFAULT_PATH = os.getenv(
+    'WORDGAME_DICTIONARY',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'words.dat')
+)
+
+
+def normalize_words(words):
+    """Lowercase, filter and sort a word iterable the way the game expects"""
+    result = set()
+    for word in words:
+        word = word.lower()
+        if len(word) >= MIN_WORD_LENGTH and word.isascii() and word.isalpha():
+            result.add(word.encode('ascii'))
+    return sorted(result)
+
+
+def compile_words(words, path):
+    """Write a compiled dictionary artifact to path atomically"""
+    encoded = normalize_words(words)
+
+    offsets = array('I')
+    position = HEADER.size + 4 * (len(encoded) + 1)
+    for word in encoded:
+        offsets.append(position)
+        position += len(word)
+    offsets.append(position)
+    if sys.byteorder != 'little':
+        offsets.byteswap()
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    # Write to a temporary file first so concurrent workers never see a partial artifact
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(encoded), 0))
+        f.write(offsets.tobytes())
+        for word in encoded:
+            f.write(word)
+    os.replace(tmp_path, path)
+
+    return len(encoded)
+
+
+def nltk_words():
+    """Fetch the NLTK English word list (only needed when building the artifact)"""
+    import nltk
+    nltk.download('words', quiet=True)
+    from nltk.corpus import words as corpus
+    return corpus.words()
+
+
+class Dictionary:
+    """Read-only, memory-mapped view of a compiled word list
+
+    The file is mapped rather than read so every worker process on the host
+    shares the same pages through the OS page cache.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, count, _ = HEADER.unpack_from(self._buffer, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a compiled dictionary")
+
+        offsets = memoryview(self._buffer)[HEADER.size:HEADER.size + 4 * (count + 1)].cast('I')
+        if sys.byteorder != 'little':
+            offsets = array('I', offsets)
+            offsets.byteswap()
+
+        self._count = count
+        self._offsets = offsets
+
+    def __reduce__(self):
+        # Pickled as its path, so another process maps the same file (once)
+        return load_dictionary, (self.path,)
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        for i in range(self._count):
+            yield self.word_at(i)
+
+    def __contains__(self, word):
+        try:
+            key = word.encode('ascii')
+        except (AttributeError, UnicodeEncodeError):
+            return False
+
+        offsets, buf = self._offsets, self._buffer
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) >> 1
+            if buf[offsets[mid]:offsets[mid + 1]] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo < self._count and buf[offsets[lo]:offsets[lo + 1]] == key
+
+    def word_at(self, index):
+        """Return the word stored at a sorted index"""
+        return self._buffer[self._offsets[index]:self._offsets[index + 1]].decode('ascii')
+
+    def narrow(self, lo, hi, depth, letter):
+        """Return the sub-range of [lo, hi) whose words have letter at position depth
+
+        Every word in [lo, hi) must share the same depth-letter prefix, which makes
+        the sorted array behave like an implicit prefix trie. letter is a byte value.
+        """
+        offsets, buf = self._offsets, self._buffer
+
+        # First word whose letter at depth is >= letter (shorter words sort first)
+        end = hi
+        while lo < hi:
+            mid = (lo + hi) >> 1
+            pos = offsets[mid] + depth
+            if pos < offsets[mid + 1] and buf[pos] >= letter:
+                hi = mid
+            else:
+                lo = mid + 1
+        first = lo
+
+        # First word whose letter at depth is > letter
+        hi = end
+        while lo < hi:
+            mid = (lo + hi) >> 1
+            if buf[offsets[mid] + depth] > letter:
+                hi = mid
+            else:
+                lo = mid + 1
+
+        return first, lo
+
+    def is_word(self, lo, hi, depth):
+        """Check whether the shared depth-letter prefix of [lo, hi) is itself a word"""
+        return lo < hi and self._offsets[lo + 1] - self._offsets[lo] == depth
+
+    def close(self):
+        if isinstance(self._offsets, memoryview):
+            self._offsets.release()
+        self._buffer.close()
+
+
+# Dictionaries already opened in this process, by path
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+
+def load_dictionary(path=None):
+    """Open the compiled dictionary, building it from NLTK first if it is missing
+
+    Each file is mapped once per process and shared by every caller, so both
+    front ends running in one process use the same Dictionary.
+    """
+    path = os.path.abspath(path or DEFAULT_PATH)
+    with _loaded_lock:
+        dictionary = _loaded.get(path)
+        if dictionary is None:
+            if not os.path.exists(path):
+                compile_words(nltk_words(), path)
+            dictionary = _loaded[path] = Dictionary(path)
+    return dictionary
@@ -0,0 +1,110 @@
+from collections import Counter
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def grid_neighbors(rows, cols):
+    """Return the adjacent cell indexes (including diagonals) for each cell of a flattened grid"""
+    neighbors = []
+    for row in range(rows):
+        for col in range(cols):
+            cells = []
+            for dr in (-1, 0, 1):
+                for dc in (-1, 0, 1):
+                    r, c = row + dr, col + dc
+                    if (dr or dc) and 0 <= r < rows and 0 <= c < cols:
+                        cells.append(r * cols + c)
+            neighbors.append(tuple(cells))
+    return tuple(neighbors)
+
+
+@lru_cache(maxsize=None)
+def neighbor_masks(rows, cols):
+    """Return a bitmask of adjacent cells for each cell of a flattened grid"""
+    return tuple(sum(1 << cell for cell in cells) for cells in grid_neighbors(rows, cols))
+
+
+class GridSearch:
+    """Bitmask index of one board, reusable for any number of word lookups
+
+    Cells are numbered row by row and sets of cells are plain int bitmasks, so
+    adjacency, letter positions and visited state are all single integer ops.
+    """
+
+    def __init__(self, grid):
+        self.rows, self.cols = len(grid), len(grid[0])
+        self.neighbors = neighbor_masks(self.rows, self.cols)
+
+        # Letter -> bitmask of the cells holding it
+        self.cells = {}
+        for index, letter in enumerate(letter for row in grid for letter in row):
+            self.cells[letter] = self.cells.get(letter, 0) | 1 << index
+        self.counts = {letter: bin(mask).count('1') for letter, mask in self.cells.items()}
+
+    def __contains__(self, word):
+        return self.contains(word)
+
+    def contains(self, word):
+        """Check if word can be traced through adjacent, unused cells"""
+        word = word.lower()
+        if not word:
+            return False
+
+        # The board must hold enough copies of every letter before any path can exist
+        for letter, count in Counter(word).items():
+            if self.counts.get(letter, 0) < count:
+                return False
+
+        neighbors = self.neighbors
+        last = len(word) - 1
+
+        # Working back from the last letter, keep only cells that have a neighbor
+        # able to continue the word. Ignoring visited cells this is a cheap
+        # necessary condition, and it rejects most impossible words outright.
+        masks = [0] * len(word)
+        masks[last] = self.cells[word[last]]
+        for depth in range(last - 1, -1, -1):
+            reachable = 0
+            following = masks[depth + 1]
+            while following:
+                low = following & -following
+                following ^= low
+                reachable |= neighbors[low.bit_length() - 1]
+            masks[depth] = self.cells[word[depth]] & reachable
+            if not masks[depth]:
+                return False
+
+        # Iterative DFS. A (visited cells, current cell) state fully determines the
+        # rest of the search, so each state is expanded at most once; repeated
+        # letters reaching the same cells in a different order are not re-searched.
+        stack = []
+        starts = masks[0]
+        while starts:
+            low = starts & -starts
+            starts ^= low
+            stack.append((low.bit_length() - 1, low, 0))
+
+        seen = set()
+        while stack:
+            cell, visited, depth = stack.pop()
+            if depth == last:
+                return True
+
+            candidates = neighbors[cell] & masks[depth + 1] & ~visited
+            while candidates:
+                low = candidates & -candidates
+                candidates ^= low
+                state = visited | low
+                nxt = low.bit_length() - 1
+                key = state << 8 | nxt
+                if key in seen:
+                    continue
+                seen.add(key)
+                stack.append((nxt, state, depth + 1))
+
+        return False
+
+
+def is_word_in_grid(word, grid):
+    """Check if word can be formed from adjacent letters in the grid"""
+    return GridSearch(grid).contains(word)
@@ -0,0 +1,103 @@
+import time
+
+from .gridsearch import GridSearch
+from .scoring import calculate_score, determine_winners, settle_round
+
+NOT_IN_PROGRESS = 'Game not in progress'
+INVALID_WORD = 'Invalid word'
+
+
+def record_words(store, dictionary, room_code, game, player_id, words):
+    """Check a player's words against the board and record the valid ones
+
+    game is the room's round fields (store.get_meta()); store is a game store
+    from store.py. Returns a result per word: {'word', 'valid', 'score',
+    'total_score'} if it was added, or {'word', 'valid', 'reason'} if not,
+    in the order the words were given. The store checks the round is still in
+    progress as it reads and writes, since it may have ended after game was read.
+    """
+    # Entries that are not strings are refused in place, so results line up with the words given
+    results = [{'word': word, 'valid': False, 'reason': INVALID_WORD} for word in words]
+    checked = [i for i, word in enumerate(words) if isinstance(word, str)]
+    words = [words[i].lower() for i in checked]
+
+    # Check which words are findable on this board
+    if game['solved']:
+        found = store.check_solutions(room_code, words)
+    else:
+        # Board was not solved within its time budget, search the grid directly
+        search = GridSearch(game['grid'])
+        found = [word in dictionary and search.contains(word) for word in words]
+    if found is None:
+        for i, word in zip(checked, words):
+            results[i] = {'word': word, 'valid': False, 'reason': NOT_IN_PROGRESS}
+        return results
+    # Everything submitted during the round is logged, so it can be replayed and audited later
+    store.log_submissions(room_code, player_id, words, time.time())
+
+    valid = []
+    for i, word, ok in zip(checked, words, found):
+        if ok:
+            valid.append(i)
+            results[i] = {'word': word, 'valid': True, 'score': calculate_score(word)}
+        else:
+            reason = 'Not in dictionary' if word not in dictionary else 'Cannot be formed from grid'
+            results[i] = {'word': word, 'valid': False, 'reason': reason}
+
+    # Valid words are added in order (unless already used by this player)
+    totals = store.add_words(room_code, player_id, [(results[i]['word'], results[i]['score']) for i in valid])
+    if totals is None:
+        for i in valid:
+            results[i] = {'word': results[i]['word'], 'valid': False, 'reason': NOT_IN_PROGRESS}
+        return results
+    for i, total_score in zip(valid, totals):
+        if total_score is None:
+            results[i] = {'word': results[i]['word'], 'valid': False, 'reason': 'Already used'}
+        else:
+            results[i]['total_score'] = total_score
+
+    return results
+
+
+def finish_round(store, room_code):
+    """Score a room's round once time is up; only the first caller gets the game
+
+    Cancels shared words, saves the results to the store and returns the
+    finished game with 'missed_words', 'winners' and the round's
+    'submissions' log added, or None if the round was already finished.
+    """
+    if not store.finish_game(room_code):
+        return None
+
+    game = store.get_game(room_code, include_solutions=True)
+    game['submissions'] = store.get_submissions(room_code)
+    game['missed_words'] = settle_round(game['players'], game['solutions'], calculate_score)
+    store.save_results(room_code, game['players'], game['missed_words'])
+    game['winners'] = determine_winners(game['players'])
+    return game
+
+
+def replay_round(solutions, names, submissions):
+    """Recompute a round's results from its submission log
+
+    solutions is the board's full word set, names maps player id -> name for
+    the players still in the room at the end, and submissions is the log as
+    (submitted_at, player id, words) in the order it was written. Applies the
+    same rules as record_words and finish_round, and returns the players as
+    finish_round would have saved them along with the missed words.
+    """
+    players = {pid: {'name': name, 'score': 0, 'words': {}} for pid, name in names.items()}
+    for _, player_id, words in submissions:
+        player = players.get(player_id)
+        # Players who left before the end are not scored
+        if player is None:
+            continue
+        for word in words:
+            if word in solutions and word not in player['words']:
+                player['words'][word] = None
+                player['score'] += calculate_score(word)
+
+    for player in players.values():
+        player['words'] = list(player['words'])
+    missed_words = settle_round(players, solutions, calculate_score)
+    return players, missed_words
@@ -0,0 +1,47 @@
+from collections import Counter
+
+
+def calculate_score(word):
+    """Calculate word score - longer words are worth more points"""
+    length = len(word)
+    if length <= 3:
+        return 1
+    elif length == 4:
+        return 2
+    elif length == 5:
+        return 4
+    elif length == 6:
+        return 6
+    elif length == 7:
+        return 8
+    else:
+        return 10
+
+
+def settle_round(players, solutions, calculate_score):
+    """Apply end-of-round scoring and return the words nobody found
+
+    Words found by more than one player are removed from each of their lists
+    and their points deducted. players maps player id -> {'name', 'score',
+    'words'} and is updated in place; solutions is the board's word set, or
+    None if it was never solved. Runs in time linear in the words found,
+    however many players there are.
+    """
+    # How many players found each word
+    owners = Counter(word for player in players.values() for word in set(player['words']))
+    shared = {word for word, count in owners.items() if count > 1}
+
+    if shared:
+        for player in players.values():
+            lost = shared.intersection(player['words'])
+            if lost:
+                player['words'] = [word for word in player['words'] if word not in lost]
+                player['score'] -= sum(calculate_score(word) for word in lost)
+
+    return sorted((solutions or set()) - owners.keys())
+
+
+def determine_winners(players):
+    """Return the ids of the players with the highest score"""
+    max_score = max((player['score'] for player in players.values()), default=None)
+    return [pid for pid, player in players.items() if player['score'] == max_score]
@@ -0,0 +1,44 @@
+import time
+
+from .gridsearch import grid_neighbors
+
+
+def solve_grid(grid, dictionary, deadline=None):
+    """Return the set of every dictionary word that can be traced through the grid
+
+    Walks the grid once, narrowing a range of the sorted dictionary as each letter
+    is appended, so any path whose prefix starts no word is abandoned immediately.
+    Returns None if a time.perf_counter() deadline is given and passes first.
+    """
+    rows, cols = len(grid), len(grid[0])
+    letters = [ord(letter) for row in grid for letter in row]
+    neighbors = grid_neighbors(rows, cols)
+    narrow, is_word, word_at = dictionary.narrow, dictionary.is_word, dictionary.word_at
+
+    found = set()
+    total = len(dictionary)
+    steps = 0
+    for start, letter in enumerate(letters):
+        lo, hi = narrow(0, total, 0, letter)
+        if lo == hi:
+            continue
+
+        # Each entry is (cell, visited bitmask, prefix length, dictionary range)
+        stack = [(start, 1 << start, 1, lo, hi)]
+        while stack:
+            steps += 1
+            if deadline is not None and not steps & 0xff and time.perf_counter() > deadline:
+                return None
+
+            cell, visited, depth, lo, hi = stack.pop()
+            if is_word(lo, hi, depth):
+                found.add(word_at(lo))
+
+            for nxt in neighbors[cell]:
+                if visited >> nxt & 1:
+                    continue
+                next_lo, next_hi = narrow(lo, hi, depth, letters[nxt])
+                if next_lo < next_hi:
+                    stack.append((nxt, visited | 1 << nxt, depth + 1, next_lo, next_hi))
+
+    return found
@@ -0,0 +1,55 @@
+import base64
+import math
+import os
+
+# Two 32-bit FNV-1a hashes with different offset bases; static/js/wordfilter.js
+# computes exactly the same ones, so keep the two files in step
+FNV_PRIME = 16777619
+SEEDS = (2166136261, 0x9747B28C)
+
+
+def fnv1a(word, seed):
+    value = seed
+    for byte in word.encode('utf-8'):
+        value = ((value ^ byte) * FNV_PRIME) & 0xFFFFFFFF
+    # MurmurHash3's finalizer, since FNV alone spreads short words poorly
+    value = ((value ^ (value >> 16)) * 0x85EBCA6B) & 0xFFFFFFFF
+    value = ((value ^ (value >> 13)) * 0xC2B2AE35) & 0xFFFFFFFF
+    return value ^ (value >> 16)
+
+
+def bit_positions(word, size, hashes):
+    """The bits a word sets, by double hashing: (h1 + i * h2) mod size"""
+    first, second = (fnv1a(word, seed) for seed in SEEDS)
+    return [(first + i * second) % size for i in range(hashes)]
+
+
+def build_word_filter(words, error_rate=None):
+    """Build a Bloom filter of a board's valid words for the client
+
+    Returns {'bits': base64 string, 'size': bits, 'hashes': hash count}, or
+    None when words is None (an unsolved board, where the client cannot check
+    anything). The filter never rejects a word in words, and accepts any other
+    word with probability about error_rate; at the default 1% a board with 300
+    words costs under 500 bytes of JSON.
+    """
+    if words is None:
+        return None
+    error_rate = error_rate if error_rate is not None else float(os.getenv('WORD_FILTER_ERROR_RATE', 0.01))
+    count = max(len(words), 1)
+    size = max(8, math.ceil(-count * math.log(error_rate) / math.log(2) ** 2))
+    size = (size + 7) // 8 * 8
+    hashes = max(1, round(size / count * math.log(2)))
+
+    bits = bytearray(size // 8)
+    for word in words:
+        for position in bit_positions(word, size, hashes):
+            bits[position >> 3] |= 1 << (position & 7)
+    return {'bits': base64.b64encode(bits).decode('ascii'), 'size': size, 'hashes': hashes}
+
+
+def might_contain(word_filter, word):
+    """Check a word against a filter from build_word_filter (False means definitely not)"""
+    bits = base64.b64decode(word_filter['bits'])
+    return all(bits[position >> 3] & (1 << (position & 7))
+               for position in bit_positions(word, word_filter['size'], word_filter['hashes']))
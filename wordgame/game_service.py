@@ -0,0 +1,159 @@
+"""Rooms and rounds as both front ends run them
+
+The real-time (realtime.py) and simple (simple_app.py) front ends each create
+one GameService: the game store, the board pool, round timers, the room
+reaper, the match history and word checking, wired together the same way for
+both. A front end passes in callbacks for the little it does differently,
+such as emitting Socket.IO events, so a change to how rounds are started,
+played or ended lands in both.
+"""
+import os
+import time
+
+import background
+from engine import default_board_pool, finish_round, load_dictionary, record_words
+from history import MatchHistory
+from metrics import registry, word_check_seconds, word_rejections
+from ratelimit import create_word_limiter
+from reaper import RoomReaper
+from store import create_store
+from timers import RoundTimers
+
+# Largest room a player can ask for
+MAX_ROOM_PLAYERS = int(os.getenv('MAX_ROOM_PLAYERS', 100))
+# Most words checked from one batched submission
+MAX_BATCH_WORDS = int(os.getenv('MAX_BATCH_WORDS', 50))
+# Length of a round in seconds
+ROUND_SECONDS = float(os.getenv('ROUND_SECONDS', 120))
+# Result for each word past MAX_BATCH_WORDS
+TOO_MANY_WORDS = 'Too many words in one batch'
+
+
+def room_size(data):
+    """Players per room requested by a client, within 2..MAX_ROOM_PLAYERS"""
+    try:
+        size = int(data.get('max_players', 2))
+    except (TypeError, ValueError):
+        size = 2
+    return max(2, min(size, MAX_ROOM_PLAYERS))
+
+
+class GameService:
+    """One front end's rooms and the background services that keep them going
+
+    The callbacks are optional and run on whichever thread made the change:
+      round_started(room_code, board, end_time)
+      round_ended(room_code, game)   with game as returned by engine.finish_round
+      words_found(room_code, player_id, results)   the accepted words of a submission
+      room_evicted(room_code, reason)   after the reaper deleted an idle room
+    """
+
+    def __init__(self, round_started=None, round_ended=None, words_found=None, room_evicted=None):
+        self.round_started = round_started
+        self.round_ended = round_ended
+        self.words_found = words_found
+        self.room_evicted = room_evicted
+
+        # Game state storage (in-process, or shared between workers via GAME_STORE_URL)
+        self.store = create_store()
+        # Memory-mapped word list shared by all workers (see build_dictionary.py), loaded once per process
+        self.dictionary = load_dictionary()
+        # Token buckets on submitted words per player and per room (see ratelimit.py)
+        self.word_limiter = create_word_limiter(self.store)
+        # Vetted boards are generated ahead of time so starting a round never waits
+        self.board_pool = background.start(default_board_pool())
+        # Finished rounds are written to the match history database in the background
+        self.match_history = background.start(MatchHistory())
+        # One thread ends every room's round on time, whichever request started it
+        self.round_timers = background.start(RoundTimers(self.end_round_when_due))
+        # Idle rooms are deleted so memory stays bounded (see reaper.py for settings)
+        self.room_reaper = background.start(RoomReaper(self.store, self._evict_room))
+
+        # Gauges read when /metrics is scraped
+        registry.gauge('wordgame_rooms', 'Rooms in the game store', self.store.room_count)
+        registry.gauge('wordgame_players', 'Players in rooms in the game store', self.store.player_count)
+        registry.gauge('wordgame_history_queue', 'Finished rounds waiting to be written to the match history',
+                       self.match_history.pending)
+
+    def create_room(self, player_id, player_name, max_players, tournament=None):
+        """Create a waiting room with its first player and return its code"""
+        # Take the next unused room code (create_game still refuses codes in use)
+        while True:
+            room_code = self.store.allocate_code()
+            if self.store.create_game(room_code, player_id, player_name, max_players=max_players,
+                                      tournament=tournament):
+                return room_code
+
+    def start_round(self, room_code, expected_status):
+        """Start a round if the room is still in expected_status; True if this call started it"""
+        # Take a pre-solved board so submissions are a single set lookup
+        board = self.board_pool.get()
+        end_time = time.time() + ROUND_SECONDS
+
+        # Only one caller can move the room out of expected_status, the others hand their board back
+        if not self.store.start_round(room_code, board, end_time, expected_status):
+            self.board_pool.put_back(board)
+            return False
+
+        # Schedule game end (replaces any timer left over from an earlier round)
+        self.round_timers.schedule(room_code, end_time)
+        if self.round_started is not None:
+            self.round_started(room_code, board, end_time)
+        return True
+
+    def end_round(self, room_code):
+        """Score a room's round; does nothing unless the round is still in progress"""
+        # Only the first caller to finish the game scores it
+        game = finish_round(self.store, room_code)
+        if game is None:
+            return
+        self.match_history.record(room_code, game['players'], game['winners'], game['max_score'],
+                                  seed=game['seed'], grid=game['grid'], submissions=game['submissions'])
+        if self.round_ended is not None:
+            self.round_ended(room_code, game)
+
+    def end_round_when_due(self, room_code):
+        """Round timer callback, ends the round unless a newer one has started"""
+        meta = self.store.get_meta(room_code)
+        if meta is None or time.time() < meta['round_end_time']:
+            return
+        self.end_round(room_code)
+
+    def _evict_room(self, room_code, reason):
+        """Reaper callback for a room deleted for being idle or over capacity"""
+        self.round_timers.cancel(room_code)
+        if self.room_evicted is not None:
+            self.room_evicted(room_code, reason)
+
+    def check_round(self, room_code):
+        """Return (round fields, None) if the room's round is in progress, else (None, error message)"""
+        game = self.store.get_meta(room_code)
+        if game is None:
+            return None, 'Game not found'
+        if game['status'] != 'playing':
+            return None, 'Game not in progress'
+        if time.time() > game['round_end_time']:
+            # The timer would end it shortly anyway
+            self.end_round(room_code)
+            return None, 'Time is up'
+        return game, None
+
+    def submit_words(self, room_code, game, player_id, words):
+        """Check and record a player's words in one pass; returns a result per word, in the order given"""
+        # Words past the batch limit are refused rather than dropped, so every word gets a result
+        excess = [{'word': word.lower() if isinstance(word, str) else word, 'valid': False, 'reason': TOO_MANY_WORDS}
+                  for word in words[MAX_BATCH_WORDS:]]
+        # Words over the player's or room's rate are refused before any checking
+        words, refused = self.word_limiter.admit(room_code, player_id, words[:MAX_BATCH_WORDS])
+        started = time.perf_counter()
+        results = record_words(self.store, self.dictionary, room_code, game, player_id, words) + refused + excess
+        word_check_seconds.observe(time.perf_counter() - started, 'solutions' if game['solved'] else 'grid')
+
+        for result in results:
+            if not result['valid']:
+                word_rejections.inc(result['reason'])
+
+        accepted = [result for result in results if result['valid']]
+        if accepted and self.words_found is not None:
+            self.words_found(room_code, player_id, accepted)
+        return results
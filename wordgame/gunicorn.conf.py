@@ -0,0 +1,36 @@
+# Flask-SocketIO keeps each client's connection state in the process that accepted
+# it, so an instance runs a single gunicorn worker and gets its concurrency from
+# threads. To use more cores, run one instance per port behind a load balancer
+# with sticky sessions (see deploy/nginx.conf) and point every instance at the
+# same SOCKETIO_MESSAGE_QUEUE and GAME_STORE_URL.
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = 1
+threads = int(os.getenv('GUNICORN_THREADS', 100))
+
+# GUNICORN_PRELOAD=1 imports the app once in the master, so a worker that is
+# (re)started only has to fork; the dictionary is a shared memory map either way.
+# Background threads do not survive fork(), so they are started in each worker.
+preload_app = os.getenv('GUNICORN_PRELOAD') == '1'
+if preload_app:
+    os.environ['WORDGAME_DEFER_THREADS'] = '1'
+
+
+def on_starting(server):
+    # Build the dictionary artifact once here rather than in every worker
+    from engine.dictionary import DEFAULT_PATH, compile_words, nltk_words
+    if not os.path.exists(DEFAULT_PATH):
+        compile_words(nltk_words(), DEFAULT_PATH)
+
+
+def post_fork(server, worker):
+    if preload_app:
+        import background
+        background.start_all()
+
+
+def worker_exit(server, worker):
+    # Board worker processes are shut down with their gunicorn worker
+    import background
+    background.stop_all()
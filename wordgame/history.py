@@ -0,0 +1,316 @@
+"""Match history and the leaderboard, kept in a local SQLite database
+
+Finished rounds are queued in memory and a background thread writes whatever
+has queued up in one transaction every HISTORY_FLUSH_INTERVAL seconds, so
+ending a round never waits on the disk. The database runs in WAL mode, so
+reading a player's history never blocks the writer, and several server
+processes can share one file. Match and result rows are only ever appended;
+each player's totals are updated alongside them in the same transaction.
+
+Each match also keeps its board's seed and every batch of words its players
+submitted, so replay.py can recompute and audit archived rounds offline.
+"""
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from bisect import insort
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS matches (
+    id INTEGER PRIMARY KEY,
+    room_code TEXT NOT NULL,
+    ended_at REAL NOT NULL,
+    max_score INTEGER,
+    seed INTEGER,
+    grid TEXT
+);
+CREATE TABLE IF NOT EXISTS results (
+    match_id INTEGER NOT NULL REFERENCES matches (id),
+    player_id TEXT,
+    name TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    words INTEGER NOT NULL,
+    won INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_by_name ON results (name, match_id);
+CREATE INDEX IF NOT EXISTS results_by_match ON results (match_id);
+CREATE TABLE IF NOT EXISTS submissions (
+    match_id INTEGER NOT NULL REFERENCES matches (id),
+    player_id TEXT NOT NULL,
+    submitted_at REAL NOT NULL,
+    words TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS submissions_by_match ON submissions (match_id);
+CREATE TABLE IF NOT EXISTS players (
+    name TEXT PRIMARY KEY,
+    games INTEGER NOT NULL,
+    wins INTEGER NOT NULL,
+    total_score INTEGER NOT NULL,
+    best_score INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS players_by_best ON players (best_score);
+"""
+
+UPSERT_PLAYER = """
+INSERT INTO players (name, games, wins, total_score, best_score) VALUES (?, 1, ?, ?, ?)
+ON CONFLICT (name) DO UPDATE SET
+    games = games + 1,
+    wins = wins + excluded.wins,
+    total_score = total_score + excluded.total_score,
+    best_score = max(best_score, excluded.best_score)
+"""
+
+# Columns added since the tables were first created, which older databases get at startup
+ADDED_COLUMNS = [('matches', 'seed', 'INTEGER'), ('matches', 'grid', 'TEXT'), ('results', 'player_id', 'TEXT')]
+
+
+def default_path():
+    return os.getenv('HISTORY_DB') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'history.db')
+
+
+def add_columns(connection):
+    """Bring the tables of an older database up to date with SCHEMA"""
+    for table, column, kind in ADDED_COLUMNS:
+        columns = {row[1] for row in connection.execute(f"PRAGMA table_info({table})")}
+        if column not in columns:
+            try:
+                connection.execute(f"ALTER TABLE {table} ADD COLUMN {column} {kind}")
+            except sqlite3.OperationalError:
+                # Another server process got there first
+                pass
+
+
+class TopScores:
+    """The `size` players with the best single-round scores, kept sorted
+
+    A player's best score only ever goes up, so someone who drops out of the
+    table can only get back in by beating its lowest entry; each finished
+    round updates the table in O(size) without looking anything up.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._best = {}
+        # (-score, name), best first
+        self._entries = []
+        self._lock = threading.Lock()
+
+    def add(self, name, score):
+        with self._lock:
+            current = self._best.get(name)
+            if current is not None:
+                if score <= current:
+                    return
+                self._entries.remove((-current, name))
+            elif len(self._entries) >= self.size:
+                lowest, dropped = self._entries[-1]
+                if score <= -lowest:
+                    return
+                self._entries.pop()
+                del self._best[dropped]
+            self._best[name] = score
+            insort(self._entries, (-score, name))
+
+    def top(self, limit=None):
+        with self._lock:
+            entries = self._entries[:limit]
+        return [{'name': name, 'best_score': -score} for score, name in entries]
+
+
+class MatchHistory:
+    """Durable record of every finished round, plus the in-memory leaderboard
+
+    record() only queues the round and updates the leaderboard, so it is cheap
+    to call from a handler. The leaderboard is loaded from the database at
+    startup and every LEADERBOARD_REFRESH seconds, which brings in rounds
+    recorded by other server processes.
+    """
+
+    def __init__(self, path=None, leaderboard_size=None, interval=None, refresh=None):
+        self.path = path or default_path()
+        self.interval = interval if interval is not None else float(os.getenv('HISTORY_FLUSH_INTERVAL', 1))
+        self.refresh = refresh if refresh is not None else float(os.getenv('LEADERBOARD_REFRESH', 60))
+        self.leaderboard = TopScores(leaderboard_size if leaderboard_size is not None
+                                     else int(os.getenv('LEADERBOARD_SIZE', 100)))
+        self._queue = queue.SimpleQueue()
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._thread = None
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        connection = self._connection()
+        # WAL is a property of the file, so this only needs doing once
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.executescript(SCHEMA)
+        add_columns(connection)
+        self.reload()
+
+    def _connection(self):
+        """This thread's connection (sqlite3 connections cannot be shared between threads)"""
+        connection = getattr(self._local, 'connection', None)
+        # Nor between processes: a worker forked from a preloaded master opens its own
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30)
+            # With WAL, syncing at checkpoints only still never corrupts the database
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def start(self):
+        """Start the writer thread (safe to call more than once)"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                if self._thread is None:
+                    # Write out whatever is still queued when the server shuts down
+                    atexit.register(self.flush)
+                self._thread = threading.Thread(target=self._run, name='history-writer', daemon=True)
+                self._thread.start()
+
+    def record(self, room_code, players, winners, max_score=None, ended_at=None,
+               seed=None, grid=None, submissions=()):
+        """Queue a finished round; players maps player id -> {'name', 'score', 'words'}
+
+        submissions is the round's log from the store, as (submitted_at,
+        player id, words); player ids are stored JSON encoded, as in store.py.
+        """
+        results = [(json.dumps(player_id), player['name'], player['score'], len(player['words']),
+                    int(player_id in winners))
+                   for player_id, player in players.items()]
+        log = [(json.dumps(player_id), submitted_at, json.dumps(words))
+               for submitted_at, player_id, words in submissions]
+        match = (room_code, ended_at or time.time(), max_score, seed, json.dumps(grid) if grid else None)
+        self._queue.put((match, results, log))
+        for _, name, score, _, _ in results:
+            self.leaderboard.add(name, score)
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def flush(self):
+        """Write every queued round in one transaction; returns how many were written"""
+        with self._write_lock:
+            rounds = []
+            while True:
+                try:
+                    rounds.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not rounds:
+                return 0
+
+            connection = self._connection()
+            try:
+                with connection:
+                    for match, results, log in rounds:
+                        match_id = connection.execute(
+                            'INSERT INTO matches (room_code, ended_at, max_score, seed, grid) VALUES (?, ?, ?, ?, ?)',
+                            match).lastrowid
+                        connection.executemany(
+                            'INSERT INTO results (match_id, player_id, name, score, words, won) '
+                            'VALUES (?, ?, ?, ?, ?, ?)',
+                            [(match_id, *result) for result in results])
+                        connection.executemany(
+                            'INSERT INTO submissions (match_id, player_id, submitted_at, words) VALUES (?, ?, ?, ?)',
+                            [(match_id, *entry) for entry in log])
+                        connection.executemany(
+                            UPSERT_PLAYER, [(name, won, score, score) for _, name, score, _, won in results])
+            except Exception:
+                # Nothing was written, so keep the rounds for the next attempt
+                for item in rounds:
+                    self._queue.put(item)
+                raise
+            return len(rounds)
+
+    def reload(self):
+        """Merge the best scores in the database into the leaderboard"""
+        rows = self._connection().execute(
+            'SELECT name, best_score FROM players ORDER BY best_score DESC LIMIT ?', (self.leaderboard.size,))
+        for name, best_score in rows:
+            self.leaderboard.add(name, best_score)
+
+    def player(self, name, limit=20):
+        """A player's totals and most recent rounds, or None if they have not played"""
+        connection = self._connection()
+        totals = connection.execute(
+            'SELECT games, wins, total_score, best_score FROM players WHERE name = ?', (name,)).fetchone()
+        if totals is None:
+            return None
+        rounds = connection.execute(
+            'SELECT m.room_code, m.ended_at, r.score, r.words, r.won FROM results r '
+            'JOIN matches m ON m.id = r.match_id WHERE r.name = ? ORDER BY r.match_id DESC LIMIT ?',
+            (name, limit))
+        return {
+            'name': name,
+            'games': totals[0],
+            'wins': totals[1],
+            'total_score': totals[2],
+            'best_score': totals[3],
+            'recent': [{'room_code': room_code, 'ended_at': ended_at, 'score': score, 'words': words,
+                        'won': bool(won)}
+                       for room_code, ended_at, score, words, won in rounds]
+        }
+
+    def rounds(self, after=0, limit=None, batch=500):
+        """Yield archived rounds that can be replayed (those with a seed), oldest first
+
+        Each is {'id', 'room_code', 'ended_at', 'max_score', 'seed', 'grid',
+        'results', 'submissions'}, where results maps player id -> {'name',
+        'score', 'words', 'won'} and submissions is the round's log. Rounds
+        are read `batch` at a time, so any number can be streamed.
+        """
+        connection = self._connection()
+        while limit is None or limit > 0:
+            size = batch if limit is None else min(batch, limit)
+            rows = connection.execute(
+                'SELECT id, room_code, ended_at, max_score, seed, grid FROM matches '
+                'WHERE id > ? AND seed IS NOT NULL ORDER BY id LIMIT ?', (after, size)).fetchall()
+            if not rows:
+                return
+            matches = {}
+            for match_id, room_code, ended_at, max_score, seed, grid in rows:
+                matches[match_id] = {'id': match_id, 'room_code': room_code, 'ended_at': ended_at,
+                                     'max_score': max_score, 'seed': seed, 'grid': json.loads(grid),
+                                     'results': {}, 'submissions': []}
+            # Matches without a seed in between are read too, and skipped
+            span = (rows[0][0], rows[-1][0])
+            for match_id, player_id, name, score, words, won in connection.execute(
+                    'SELECT match_id, player_id, name, score, words, won FROM results '
+                    'WHERE match_id BETWEEN ? AND ?', span):
+                if match_id in matches:
+                    matches[match_id]['results'][json.loads(player_id)] = {
+                        'name': name, 'score': score, 'words': words, 'won': bool(won)}
+            log = connection.execute(
+                'SELECT match_id, player_id, submitted_at, words FROM submissions '
+                'WHERE match_id BETWEEN ? AND ? ORDER BY rowid', span).fetchall()
+            # Decoding a batch's JSON columns in one go is much faster than row by row
+            player_ids = json.loads('[' + ','.join(row[1] for row in log) + ']')
+            words = json.loads('[' + ','.join(row[3] for row in log) + ']')
+            for (match_id, _, submitted_at, _), player_id, batch_words in zip(log, player_ids, words):
+                if match_id in matches:
+                    matches[match_id]['submissions'].append((submitted_at, player_id, batch_words))
+
+            yield from matches.values()
+            after = rows[-1][0]
+            if limit is not None:
+                limit -= len(rows)
+
+    def _run(self):
+        reloaded = time.monotonic()
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception as exc:
+                print(f"Error writing match history: {exc!r}")
+            if time.monotonic() - reloaded >= self.refresh:
+                reloaded = time.monotonic()
+                try:
+                    self.reload()
+                except Exception as exc:
+                    print(f"Error reloading the leaderboard: {exc!r}")
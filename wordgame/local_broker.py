@@ -0,0 +1,35 @@
+"""Local stand-in for Redis when running several game workers on one machine.
+
+    python local_broker.py [--port 6379]
+
+Serves the Redis protocol from memory using fakeredis, so it can back both
+SOCKETIO_MESSAGE_QUEUE (event fan-out between workers) and GAME_STORE_URL
+(shared rooms) during development and load tests. Use a real Redis server in
+production; nothing here is persisted. The game store and rate limiting run
+Lua scripts, which fakeredis only supports with its lua extra
+(pip install 'fakeredis[lua]').
+"""
+import argparse
+
+
+def main():
+    parser = argparse.ArgumentParser(description='In-memory Redis-protocol broker for local multi-worker runs')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6379)
+    args = parser.parse_args()
+
+    try:
+        from fakeredis import TcpFakeServer
+    except ImportError:
+        raise SystemExit('The local broker needs fakeredis (pip install fakeredis)')
+
+    server = TcpFakeServer((args.host, args.port))
+    print(f"Local broker listening on redis://{args.host}:{args.port}/0")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
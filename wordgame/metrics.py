@@ -0,0 +1,247 @@
+"""Preaggregated counters and histograms exposed in the Prometheus text format
+
+Every series is a few numbers updated in place under a lock, so recording a
+value allocates nothing once its label values have been seen; /metrics does
+all the formatting. Gauges can be backed by a function that is only called
+when the metrics are scraped.
+"""
+import bisect
+import functools
+import os
+import threading
+import time
+
+import background
+from engine import default_board_pool
+
+# Upper bounds in seconds, from sub-millisecond lookups up to long-polls
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def format_labels(names, values, extra=''):
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = list(self._values.items())
+        for label_values, value in values:
+            lines.append(f"{self.name}{format_labels(self.labels, label_values)} {value}")
+        return lines
+
+
+class Gauge:
+    """A value set by the app, or read from funcs at scrape time
+
+    Each app running in a process can add a func for its own store or queue
+    to one gauge, and the gauge reports their sum.
+    """
+
+    def __init__(self, name, help_text, func=None):
+        self.name = name
+        self.help = help_text
+        self.funcs = []
+        self._value = 0
+        self._lock = threading.Lock()
+        self.add(func)
+
+    def add(self, func):
+        if func is not None and func not in self.funcs:
+            self.funcs.append(func)
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def render(self):
+        value = self._value
+        if self.funcs:
+            try:
+                value = sum(func() for func in self.funcs)
+            except Exception as exc:
+                print(f"Error reading metric {self.name}: {exc!r}")
+                return []
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {value}"]
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        # label values -> [count per bucket..., count above the last bucket, sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def time(self, *label_values):
+        """Decorator that observes how long each call of a function takes"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.observe(time.perf_counter() - started, *label_values)
+            return wrapper
+        return decorator
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(label_values, list(counts)) for label_values, counts in self._series.items()]
+        for label_values, counts in series:
+            total = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                total += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{format_labels(self.labels, label_values, le)} {total}")
+            labels = format_labels(self.labels, label_values)
+            lines.append(f"{self.name}_sum{labels} {counts[-1]}")
+            lines.append(f"{self.name}_count{labels} {total}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name, help_text, labels=()):
+        return self._add(Counter(name, help_text, labels))
+
+    def gauge(self, name, help_text, func=None):
+        # Both apps can be imported in one process, and a name may only be exposed once
+        for metric in self.metrics:
+            if metric.name == name and isinstance(metric, Gauge):
+                metric.add(func)
+                return metric
+        return self._add(Gauge(name, help_text, func))
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, help_text, labels, buckets))
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+class LagMonitor:
+    """Measures how late a thread wakes up from a short sleep
+
+    The WSGI servers run handlers on threads rather than an event loop, so
+    this is their equivalent of event-loop lag: when handlers hog the
+    interpreter, every thread (this one included) wakes up late. The asyncio
+    server runs watch() on its loop instead.
+    """
+
+    def __init__(self, histogram, interval=None):
+        self.histogram = histogram
+        self.interval = interval if interval is not None else float(os.getenv('LAG_PROBE_INTERVAL', 0.5))
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the probe thread (safe to call more than once)"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='lag-monitor', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            started = time.perf_counter()
+            time.sleep(self.interval)
+            self.histogram.observe(max(0.0, time.perf_counter() - started - self.interval))
+
+    async def watch(self):
+        """Measure the running event loop instead, for the asyncio server"""
+        # Imported here so the WSGI apps do not pay for asyncio at startup
+        import asyncio
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.histogram.observe(max(0.0, loop.time() - started - self.interval))
+
+
+# Metrics shared by both apps; each app adds its own gauges
+registry = Registry()
+socketio_handler_seconds = registry.histogram(
+    'wordgame_socketio_handler_seconds', 'Time spent in each Socket.IO event handler', ('event',))
+http_request_seconds = registry.histogram(
+    'wordgame_http_request_seconds', 'Time spent serving each HTTP route', ('route',))
+word_rejections = registry.counter(
+    'wordgame_word_rejections_total', 'Submitted words rejected, by reason', ('reason',))
+word_check_seconds = registry.histogram(
+    'wordgame_word_check_seconds', 'Time to check and record a batch of submitted words', ('method',))
+loop_lag_seconds = registry.histogram(
+    'wordgame_loop_lag_seconds', 'How late the lag probe woke up from its sleep')
+lag_monitor = LagMonitor(loop_lag_seconds)
+# There is one board pool per process, whichever apps are running in it
+registry.gauge('wordgame_board_pool_size', 'Boards ready in this process\'s pool',
+               lambda: len(default_board_pool()))
+registry.gauge('wordgame_inline_boards', 'Boards generated inline because the pool was empty',
+               lambda: default_board_pool().inline_boards)
+
+
+def instrument_flask(app):
+    """Time every request by its route, and serve the metrics on /metrics"""
+    from flask import Response, request
+
+    @app.before_request
+    def start_timer():
+        request.environ['wordgame.started'] = time.perf_counter()
+
+    @app.after_request
+    def record_time(response):
+        started = request.environ.get('wordgame.started')
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            http_request_seconds.observe(time.perf_counter() - started, route)
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+    background.start(lag_monitor)
+
+
+def timed_handler(event):
+    """Decorator for a Socket.IO handler, placed under @socketio.on(event)"""
+    return socketio_handler_seconds.time(event)
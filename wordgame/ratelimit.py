@@ -0,0 +1,158 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from store import RedisGameStore
+
+REASON = 'Too many words, slow down'
+
+
+def bucket_settings():
+    """(refill per second, burst) of the player and room buckets; a rate of 0 turns limiting off"""
+    return {
+        'player': (float(os.getenv('WORD_RATE', 2)), float(os.getenv('WORD_BURST', 20))),
+        'room': (float(os.getenv('ROOM_WORD_RATE', 200)), float(os.getenv('ROOM_WORD_BURST', 1000)))
+    }
+
+
+class TokenBuckets:
+    """Token buckets of one size and refill rate, by key
+
+    A bucket is just its token count and when that was last brought up to
+    date; it refills lazily whenever it is used. A bucket that has been left
+    alone long enough to fill up again is the same as a new one, so it is
+    dropped: memory is O(1) per player or room that submitted recently.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        # Key -> [tokens, last update], least recently updated first
+        self._buckets = OrderedDict()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def available(self, key, now):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return self.burst
+        return min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+
+    def take(self, key, tokens, now):
+        self._buckets[key] = [self.available(key, now) - tokens, now]
+        self._buckets.move_to_end(key)
+        # Buckets at the front that would be full by now can go
+        refill = self.burst / self.rate
+        while self._buckets:
+            oldest = next(iter(self._buckets.values()))
+            if now - oldest[1] < refill:
+                break
+            self._buckets.popitem(last=False)
+
+
+class WordLimiter:
+    """Token-bucket limits on submitted words, per player and per room
+
+    Every word submitted takes a token from the player's bucket and one from
+    the room's. admit() is called before any word is checked, so a client
+    spraying words is turned away after a couple of dictionary lookups here,
+    never reaching the dictionary or the grid. Buckets are kept in this
+    process; see RedisWordLimiter for several workers.
+    """
+
+    def __init__(self, settings=None):
+        self.settings = settings if settings is not None else bucket_settings()
+        self.enabled = all(rate > 0 for rate, _ in self.settings.values())
+        self._players = TokenBuckets(*self.settings['player'])
+        self._rooms = TokenBuckets(*self.settings['room'])
+        self._lock = threading.Lock()
+
+    def take(self, room_code, player_id, count):
+        """Take up to count tokens from both buckets; returns how many were granted"""
+        now = time.monotonic()
+        with self._lock:
+            player = (room_code, player_id)
+            granted = int(min(count, self._players.available(player, now), self._rooms.available(room_code, now)))
+            granted = max(granted, 0)
+            self._players.take(player, granted, now)
+            self._rooms.take(room_code, granted, now)
+            return granted
+
+    def admit(self, room_code, player_id, words):
+        """Split a batch into the words to check and results for those refused"""
+        if not self.enabled or not words:
+            return words, []
+        granted = self.take(room_code, player_id, len(words))
+        refused = [{'word': word.lower() if isinstance(word, str) else word, 'valid': False, 'reason': REASON}
+                   for word in words[granted:]]
+        return words[:granted], refused
+
+
+# Updates a player's and a room's buckets at once, using the server's clock so
+# every worker agrees on the time. KEYS are the two buckets; ARGV is the number
+# of tokens wanted, then the rate and burst of each bucket. Each bucket expires
+# once it would have filled up again.
+TAKE_SCRIPT = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local granted = tonumber(ARGV[1])
+local levels = {}
+for i = 1, 2 do
+    local rate, burst = tonumber(ARGV[i * 2]), tonumber(ARGV[i * 2 + 1])
+    local bucket = redis.call('HMGET', KEYS[i], 'tokens', 'updated')
+    local level = burst
+    if bucket[1] then
+        level = math.min(burst, tonumber(bucket[1]) + (now - tonumber(bucket[2])) * rate)
+    end
+    levels[i] = level
+    granted = math.min(granted, math.floor(level))
+end
+granted = math.max(granted, 0)
+for i = 1, 2 do
+    local rate, burst = tonumber(ARGV[i * 2]), tonumber(ARGV[i * 2 + 1])
+    local level = levels[i] - granted
+    redis.call('HSET', KEYS[i], 'tokens', tostring(level), 'updated', string.format('%.6f', now))
+    redis.call('PEXPIRE', KEYS[i], math.ceil((burst - level) / rate * 1000) + 1)
+end
+return granted
+"""
+
+
+class RedisWordLimiter(WordLimiter):
+    """WordLimiter whose buckets live in Redis, shared by every worker
+
+    Each bucket is a hash under wordgame:limit:..., updated by one Lua script
+    call per batch, so a player cannot get a fresh bucket from each worker
+    and a room's limit holds across all of them. Buckets expire on their own
+    once full again. If the server cannot run the script, submissions go
+    through unlimited rather than failing.
+    """
+
+    def __init__(self, client, settings=None):
+        super().__init__(settings)
+        self.redis = client
+        self._script = client.register_script(TAKE_SCRIPT)
+        self._failed = False
+
+    def take(self, room_code, player_id, count):
+        prefix = f"{RedisGameStore.PREFIX}:limit:{room_code}"
+        player_rate, player_burst = self.settings['player']
+        room_rate, room_burst = self.settings['room']
+        try:
+            return int(self._script(keys=[f"{prefix}:player:{json.dumps(player_id)}", f"{prefix}:room"],
+                                    args=[count, player_rate, player_burst, room_rate, room_burst]))
+        except Exception as exc:
+            if not self._failed:
+                self._failed = True
+                print(f"Rate limiting failed, submissions are not limited: {exc!r}")
+            return count
+
+
+def create_word_limiter(store):
+    """The limiter matching a game store: shared through Redis if the store is"""
+    if isinstance(store, RedisGameStore):
+        return RedisWordLimiter(store.redis)
+    return WordLimiter()
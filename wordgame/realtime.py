@@ -0,0 +1,366 @@
+"""Socket.IO game logic shared by the threaded (app.py) and asyncio (asgi.py) servers
+
+Handlers take the sending client's sid as their player id plus the event data,
+and send everything through `transport`: an object with the python-socketio
+server methods emit(event, data, to=...), enter_room(sid, room),
+leave_room(sid, room) and close_room(room). Each front end installs its own
+with use_transport() and calls the handlers from threads, so the game logic
+may block on the store.
+"""
+import os
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+import background
+from batcher import EventBatcher
+from game_service import GameService, room_size
+from tournament import add_entrant, begin_stage, new_tournament, record_result, split_into_rooms, start_tournament
+from metrics import registry, timed_handler
+from store import MemoryGameStore
+
+# With several worker processes, SOCKETIO_MESSAGE_QUEUE (e.g. redis://host:6379/0)
+# relays every emit through a broker so it reaches room members on all workers
+message_queue = os.getenv('SOCKETIO_MESSAGE_QUEUE')
+
+# Where events are sent, set by the front end with use_transport()
+transport = None
+
+def use_transport(server):
+    global transport
+    transport = server
+
+def announce_round(room_code, board, end_time):
+    # Send game start event with grid and the filter clients check words against
+    transport.emit('game_started', {
+        'grid': board.grid,
+        'end_time': end_time,
+        'word_filter': board.word_filter
+    }, to=room_code)
+
+def announce_results(room_code, game):
+    transport.emit('game_ended', {
+        'players': game['players'],
+        'winners': game['winners'],
+        'missed_words': game['missed_words'],
+        'max_score': game['max_score']
+    }, to=room_code)
+    
+    # Tournament rooms feed their winners into the next stage
+    if game['tournament'] is not None:
+        advance_tournament(game['tournament'], room_code, game['winners'])
+
+def announce_found_words(room_code, player_id, accepted):
+    """Tell the other players what was found (but not the words), batched once per tick"""
+    player_name = store.get_player_name(room_code, player_id)
+    for result in accepted:
+        found_word_batcher.add(room_code, {
+            'player_id': player_id,
+            'name': player_name,
+            'word_length': len(result['word']),
+            'score': result['total_score']
+        })
+
+def close_room(room_code, reason):
+    """Close a room the reaper deleted for being idle or over capacity"""
+    message = 'Room closed after inactivity' if reason == 'idle' else 'Room closed, the server is full'
+    transport.emit('game_ended', {'reason': message}, to=room_code)
+    transport.close_room(room_code)
+
+# Rooms, rounds and the background services behind them (see game_service.py)
+service = GameService(round_started=announce_round, round_ended=announce_results,
+                      words_found=announce_found_words, room_evicted=close_room)
+store = service.store
+if message_queue and isinstance(store, MemoryGameStore):
+    print("Warning: SOCKETIO_MESSAGE_QUEUE is set without GAME_STORE_URL, rooms will not be shared between workers")
+
+connected_clients = registry.gauge('wordgame_connected_clients', 'Socket.IO clients connected to this process')
+
+def handle_connect(player_id):
+    connected_clients.inc()
+
+@timed_handler('disconnect')
+def handle_disconnect(player_id):
+    connected_clients.dec()
+    room = store.get_player_room(player_id)
+    if room is not None:
+        transport.leave_room(player_id, room)
+        
+        game = store.get_game(room)
+        if game is None:
+            # Still in a tournament lobby
+            leave_tournament(room, player_id)
+        elif player_id in game['players']:
+            player_name = game['players'][player_id]['name']
+            transport.emit('player_left', {'player_id': player_id, 'name': player_name}, to=room)
+            
+            remaining = store.remove_player(room, player_id)
+            
+            # Tournament rooms play on until their timer so the bracket can advance
+            if game['tournament'] is None:
+                # If fewer than two players are left mid-round, end it
+                if remaining < 2 and store.finish_game(room):
+                    transport.emit('game_ended', {'reason': 'Player disconnected'}, to=room)
+                
+                # Remove the game if all players left
+                if remaining == 0:
+                    service.round_timers.cancel(room)
+                    store.delete_game(room)
+        
+        store.delete_player_room(player_id)
+
+@timed_handler('create_game')
+def handle_create_game(player_id, data):
+    player_name = data.get('name', f"Player_{player_id[:4]}")
+    room_code = service.create_room(player_id, player_name, room_size(data))
+    
+    # Store room for player
+    store.set_player_room(player_id, room_code)
+    transport.enter_room(player_id, room_code)
+    
+    transport.emit('game_created', {'room_code': room_code, 'player_id': player_id}, to=player_id)
+    transport.emit('player_joined', {'player_id': player_id, 'name': player_name}, to=room_code)
+
+@timed_handler('join_game')
+def handle_join_game(player_id, data):
+    room_code = data.get('room_code', '').upper()
+    player_name = data.get('name', f"Player_{player_id[:4]}")
+    
+    # Tournament codes and room codes are handed out from the same sequence
+    if store.get_tournament(room_code) is not None:
+        join_tournament(room_code, player_id, player_name)
+        return
+    
+    # Add player to game if it exists, is waiting and has room
+    error = store.add_player(room_code, player_id, player_name)
+    if error:
+        transport.emit('error', {'message': error}, to=player_id)
+        return
+    
+    # Store room for player
+    store.set_player_room(player_id, room_code)
+    transport.enter_room(player_id, room_code)
+    
+    game = store.get_game(room_code)
+    
+    transport.emit('game_joined', {
+        'room_code': room_code, 
+        'player_id': player_id,
+        'players': [{'id': pid, 'name': pdata['name']} for pid, pdata in game['players'].items()]
+    }, to=player_id)
+    
+    transport.emit('player_joined', {'player_id': player_id, 'name': player_name}, to=room_code)
+    
+    # Start the game as soon as the room is full
+    if len(game['players']) == game['max_players']:
+        service.start_round(room_code, 'waiting')
+
+@timed_handler('start_game')
+def handle_start_game(player_id, data):
+    
+    room_code = store.get_player_room(player_id)
+    
+    if room_code is None:
+        transport.emit('error', {'message': 'Not in a game'}, to=player_id)
+        return
+    
+    tournament = store.get_tournament(room_code)
+    if tournament is not None:
+        if len(tournament['players']) < 2:
+            transport.emit('error', {'message': 'Need at least two players'}, to=player_id)
+            return
+        # Only the first start request moves the tournament out of waiting
+        if store.update_tournament(room_code, start_tournament):
+            tournament = store.get_tournament(room_code)
+            start_tournament_stage(room_code, tournament, list(tournament['players']))
+        return
+    
+    game = store.get_game(room_code)
+    
+    if game is None:
+        transport.emit('error', {'message': 'Game not found'}, to=player_id)
+        return
+    
+    if len(game['players']) < 2:
+        transport.emit('error', {'message': 'Need at least two players'}, to=player_id)
+        return
+    
+    service.start_round(room_code, 'waiting')
+
+@timed_handler('create_tournament')
+def handle_create_tournament(player_id, data):
+    player_name = data.get('name', f"Player_{player_id[:4]}")
+    state = new_tournament(player_id, player_name, room_size(data))
+    
+    while True:
+        code = store.allocate_code()
+        if store.create_tournament(code, state):
+            break
+    
+    # The tournament code doubles as the Socket.IO room for bracket updates
+    store.set_player_room(player_id, code)
+    transport.enter_room(player_id, code)
+    
+    transport.emit('tournament_created', {'room_code': code, 'player_id': player_id}, to=player_id)
+    transport.emit('player_joined', {'player_id': player_id, 'name': player_name}, to=code)
+
+def join_tournament(code, player_id, player_name):
+    error = store.update_tournament(code, lambda state: add_entrant(state, player_id, player_name))
+    state = store.get_tournament(code)
+    if error or state is None:
+        transport.emit('error', {'message': error or 'Game not found'}, to=player_id)
+        return
+    
+    store.set_player_room(player_id, code)
+    transport.enter_room(player_id, code)
+    
+    transport.emit('tournament_joined', {
+        'room_code': code,
+        'player_id': player_id,
+        'players': [{'id': pid, 'name': name} for pid, name in state['players'].items()]
+    }, to=player_id)
+    transport.emit('player_joined', {'player_id': player_id, 'name': player_name}, to=code)
+
+def leave_tournament(code, player_id):
+    def leave(state):
+        if state['status'] == 'waiting':
+            state['players'].pop(player_id, None)
+        return len(state['players'])
+    
+    if store.update_tournament(code, leave) == 0:
+        store.delete_tournament(code)
+
+def move_player(player_id, room_code, tournament):
+    """Move a tournament player's connection from their last room into room_code"""
+    previous = store.get_player_room(player_id)
+    if previous is not None and previous != tournament:
+        transport.leave_room(player_id, previous)
+        if store.remove_player(previous, player_id) == 0:
+            store.delete_game(previous)
+    store.set_player_room(player_id, room_code)
+    transport.enter_room(player_id, room_code)
+
+def start_tournament_stage(code, state, player_ids):
+    """Split the remaining players into rooms and start them all at once"""
+    names = state['players']
+    rooms = {}
+    groups, byes = split_into_rooms(player_ids, state['room_size'])
+    for group in groups:
+        room_code = service.create_room(group[0], names[group[0]], len(group), tournament=code)
+        for player_id in group[1:]:
+            store.add_player(room_code, player_id, names[player_id])
+        for player_id in group:
+            move_player(player_id, room_code, code)
+        rooms[room_code] = group
+    
+    stage = store.update_tournament(code, lambda tournament: begin_stage(tournament, rooms, byes))
+    transport.emit('tournament_stage', {
+        'stage': stage,
+        'rooms': {
+            room_code: [{'id': pid, 'name': names[pid]} for pid in group] for room_code, group in rooms.items()
+        },
+        'byes': [{'id': pid, 'name': names[pid]} for pid in byes]
+    }, to=code)
+    
+    for room_code in rooms:
+        service.start_round(room_code, 'waiting')
+
+def advance_tournament(code, room_code, winners):
+    """Record a finished tournament room and start the next stage once all are done"""
+    advancing = store.update_tournament(code, lambda state: record_result(state, room_code, winners))
+    if advancing is None:
+        return
+    
+    state = store.get_tournament(code)
+    if advancing:
+        start_tournament_stage(code, state, advancing)
+        return
+    
+    transport.emit('tournament_ended', {
+        'champions': [{'id': pid, 'name': state['players'][pid]} for pid in state['champions']]
+    }, to=code)
+    store.delete_tournament(code)
+
+def flush_found_words(room_code, updates):
+    """Send a room everything its players found since the last tick, as one message"""
+    transport.emit('opponents_found_words', {'updates': updates}, to=room_code)
+
+found_word_batcher = EventBatcher(flush_found_words)
+background.start(found_word_batcher)
+
+def current_round(player_id):
+    """Return (room code, round fields) for the player's round in progress, or emit why not"""
+    room_code = store.get_player_room(player_id)
+    
+    if room_code is None:
+        transport.emit('error', {'message': 'Not in a game'}, to=player_id)
+        return None
+    
+    game, error = service.check_round(room_code)
+    if error:
+        transport.emit('error', {'message': error}, to=player_id)
+        return None
+    
+    return room_code, game
+
+@timed_handler('submit_word')
+def handle_submit_word(player_id, data):
+    
+    current = current_round(player_id)
+    if current is None:
+        return
+    
+    room_code, game = current
+    transport.emit('word_result', service.submit_words(room_code, game, player_id, [str(data.get('word', ''))])[0],
+                   to=player_id)
+
+@timed_handler('submit_words')
+def handle_submit_words(player_id, data):
+    """Several words in one event, answered with one word_results event"""
+    
+    current = current_round(player_id)
+    if current is None:
+        return
+    
+    room_code, game = current
+    words = data.get('words')
+    results = service.submit_words(room_code, game, player_id, words if isinstance(words, list) else [])
+    transport.emit('word_results', {'results': results}, to=player_id)
+
+@timed_handler('restart_game')
+def handle_restart_game(player_id, data):
+    
+    room_code = store.get_player_room(player_id)
+    
+    if room_code is None:
+        transport.emit('error', {'message': 'Not in a game'}, to=player_id)
+        return
+    
+    game = store.get_meta(room_code)
+    
+    if game is None:
+        transport.emit('error', {'message': 'Game not found'}, to=player_id)
+        return
+    
+    if game['status'] != 'finished':
+        transport.emit('error', {'message': 'Cannot restart - game not finished'}, to=player_id)
+        return
+    
+    if game['tournament'] is not None:
+        transport.emit('error', {'message': 'Cannot restart - tournament rooms play one round'}, to=player_id)
+        return
+    
+    # Reset game state
+    service.start_round(room_code, 'finished')
+
+# Every client event and the handler for it; connect and disconnect are wired separately
+EVENTS = {
+    'create_game': handle_create_game,
+    'join_game': handle_join_game,
+    'start_game': handle_start_game,
+    'create_tournament': handle_create_tournament,
+    'submit_word': handle_submit_word,
+    'submit_words': handle_submit_words,
+    'restart_game': handle_restart_game
+}
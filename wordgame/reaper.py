@@ -0,0 +1,67 @@
+import os
+import threading
+import time
+from collections import Counter
+
+
+def room_ttls():
+    """Seconds a room may go unchanged in each status before it is reaped"""
+    return {
+        'waiting': float(os.getenv('ROOM_TTL_WAITING', 1800)),
+        'playing': float(os.getenv('ROOM_TTL_PLAYING', 600)),
+        'finished': float(os.getenv('ROOM_TTL_FINISHED', 600))
+    }
+
+
+class RoomReaper:
+    """Background thread that deletes idle rooms and keeps the room count bounded
+
+    Every interval it asks the store to drop rooms that have gone unchanged
+    longer than their status allows, then the least recently changed rooms
+    beyond max_rooms. on_evict(room_code, reason) runs for each room removed so
+    the app can cancel timers and tell any players still connected.
+    """
+
+    def __init__(self, store, on_evict=None, ttls=None, max_rooms=None, interval=None):
+        self.store = store
+        self.on_evict = on_evict
+        self.ttls = ttls if ttls is not None else room_ttls()
+        self.max_rooms = max_rooms if max_rooms is not None else int(os.getenv('MAX_ROOMS', 50000))
+        self.interval = interval if interval is not None else float(os.getenv('REAP_INTERVAL', 30))
+        self.evicted = Counter()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the reaper thread (safe to call more than once)"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='room-reaper', daemon=True)
+                self._thread.start()
+
+    def reap(self, now=None):
+        """Run one pass; returns the (room code, reason) pairs removed"""
+        reaped = self.store.reap(self.ttls, self.max_rooms, now)
+        for room_code, reason in reaped:
+            self.evicted[reason] += 1
+            if self.on_evict is not None:
+                try:
+                    self.on_evict(room_code, reason)
+                except Exception as exc:
+                    print(f"Error evicting room {room_code}: {exc!r}")
+        return reaped
+
+    def metrics(self):
+        return {
+            'live_rooms': self.store.room_count(),
+            'evicted_rooms': dict(self.evicted),
+            'bytes_per_room': self.store.bytes_per_room()
+        }
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.reap()
+            except Exception as exc:
+                print(f"Error reaping rooms: {exc!r}")
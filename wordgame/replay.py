@@ -0,0 +1,200 @@
+"""Replay archived rounds from the match history to audit scores and spot bots.
+
+    python replay.py --workers 4
+    python replay.py --after 120000 --limit 5000 --show 50
+
+Every round recorded with a seed (see history.py) is rebuilt from its seed and
+submission log: the grid is regenerated, solved in full, and each player's
+submissions are scored again with the game's own rules (engine.replay_round).
+Rounds whose regenerated grid or recomputed scores differ from what was
+recorded are reported.
+
+Boards are solved once per seed, in --workers processes, and kept in a cache
+of --cache boards, so rounds that share a seed reuse one solution set.
+
+Players are flagged as likely bots when, across every round replayed, nearly
+all of what they submit is on the board (--max-hit-rate over at least
+--min-attempts words) or they find an implausible share of each board's
+words on average (--max-coverage).
+"""
+import argparse
+import os
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from engine import calculate_score, grid_from_seed, load_dictionary, replay_round, solve_grid
+from history import MatchHistory, default_path
+
+# The dictionary of a solver process, set when the process starts
+_dictionary = None
+
+
+def _start_worker(dictionary):
+    global _dictionary
+    _dictionary = dictionary
+
+
+def solve_seed(key):
+    """(seed, grid size) -> (key, grid, solutions, max score)"""
+    seed, size = key
+    grid = grid_from_seed(seed, size)
+    solutions = solve_grid(grid, _dictionary)
+    return key, grid, solutions, sum(calculate_score(word) for word in solutions)
+
+
+class BoardCache:
+    """Solved boards by (seed, grid size), least recently used dropped first"""
+
+    def __init__(self, dictionary, workers, size):
+        self.size = size
+        self.solved = 0
+        self._boards = OrderedDict()
+        self._executor = None
+        if workers > 0:
+            self._executor = ProcessPoolExecutor(max_workers=workers, initializer=_start_worker,
+                                                 initargs=(dictionary,))
+        else:
+            _start_worker(dictionary)
+
+    def prepare(self, keys):
+        """Solve every key that is not cached yet; keys must all fit in the cache"""
+        missing = [key for key in set(keys) if key not in self._boards]
+        if self._executor is not None:
+            boards = self._executor.map(solve_seed, missing, chunksize=max(1, len(missing) // 64))
+        else:
+            boards = map(solve_seed, missing)
+        for key in keys:
+            if key in self._boards:
+                self._boards.move_to_end(key)
+        for key, *board in boards:
+            self._boards[key] = board
+            self.solved += 1
+        while len(self._boards) > self.size:
+            self._boards.popitem(last=False)
+
+    def get(self, key):
+        return self._boards[key]
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+
+
+class PlayerStats:
+    """A player's submissions across every round replayed"""
+
+    __slots__ = ('rounds', 'attempts', 'hits', 'coverage')
+
+    def __init__(self):
+        self.rounds = 0
+        self.attempts = 0
+        self.hits = 0
+        # Sum over rounds of the share of the board's words they found
+        self.coverage = 0.0
+
+
+def audit_round(match, grid, solutions, max_score, stats):
+    """Replay one round and add its players to stats; returns the problems found"""
+    if grid != match['grid']:
+        return [f"seed {match['seed']} now generates {grid}, recorded {match['grid']}"]
+
+    names = {pid: result['name'] for pid, result in match['results'].items()}
+    players, _ = replay_round(solutions, names, match['submissions'])
+
+    problems = []
+    if match['max_score'] is not None and match['max_score'] != max_score:
+        problems.append(f"max score {match['max_score']} recorded, {max_score} on replay")
+    for pid, result in match['results'].items():
+        player = players[pid]
+        if (result['score'], result['words']) != (player['score'], len(player['words'])):
+            problems.append(f"{result['name']}: {result['score']} points and {result['words']} words recorded, "
+                            f"{player['score']} and {len(player['words'])} on replay")
+
+    # Hit rates count every word submitted, coverage only distinct finds
+    found = defaultdict(set)
+    for _, pid, words in match['submissions']:
+        if pid in names:
+            player = stats[names[pid]]
+            player.attempts += len(words)
+            for word in words:
+                if word in solutions:
+                    player.hits += 1
+                    found[pid].add(word)
+    for pid, name in names.items():
+        stats[name].rounds += 1
+        if solutions:
+            stats[name].coverage += len(found[pid]) / len(solutions)
+    return problems
+
+
+def suspected_bots(stats, max_hit_rate, min_attempts, max_coverage):
+    """(name, stats) of implausibly accurate players, most accurate first"""
+    suspects = [(name, player) for name, player in stats.items()
+                if (player.attempts >= min_attempts and player.hits / player.attempts >= max_hit_rate) or
+                player.coverage / player.rounds >= max_coverage]
+    return sorted(suspects, key=lambda item: (-item[1].hits / max(item[1].attempts, 1), item[0]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay archived rounds to audit scores and detect bots')
+    parser.add_argument('--db', default=default_path(), help='Match history database (default HISTORY_DB)')
+    parser.add_argument('--dictionary', help='Compiled word list the rounds were played with')
+    parser.add_argument('--after', type=int, default=0, help='Only replay matches with a higher id')
+    parser.add_argument('--limit', type=int, help='Replay at most this many rounds')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Processes solving boards (0 solves in this process)')
+    parser.add_argument('--batch', type=int, default=2000, help='Rounds read and solved together')
+    parser.add_argument('--cache', type=int, default=10000, help='Solved boards kept for reuse')
+    parser.add_argument('--max-hit-rate', type=float, default=0.9)
+    parser.add_argument('--min-attempts', type=int, default=100)
+    parser.add_argument('--max-coverage', type=float, default=0.5)
+    parser.add_argument('--show', type=int, default=20, help='Mismatched rounds and suspects to list')
+    args = parser.parse_args()
+
+    history = MatchHistory(args.db)
+    boards = BoardCache(load_dictionary(args.dictionary), args.workers, max(args.cache, args.batch))
+    stats = defaultdict(PlayerStats)
+    mismatched = []
+    replayed = 0
+    start = time.time()
+
+    batch = []
+    rounds = history.rounds(after=args.after, limit=args.limit)
+    while True:
+        match = next(rounds, None)
+        if match is not None:
+            batch.append(match)
+            if len(batch) < args.batch:
+                continue
+        if not batch:
+            break
+        keys = [(match['seed'], len(match['grid'])) for match in batch]
+        boards.prepare(keys)
+        for match, key in zip(batch, keys):
+            problems = audit_round(match, *boards.get(key), stats)
+            if problems:
+                mismatched.append((match, problems))
+        replayed += len(batch)
+        batch = []
+    boards.close()
+
+    elapsed = time.time() - start
+    print(f"Replayed {replayed} rounds ({boards.solved} boards solved) in {elapsed:.2f}s")
+    print(f"{len(mismatched)} rounds differ from their recorded results")
+    for match, problems in mismatched[:args.show]:
+        print(f"  match {match['id']} (room {match['room_code']}, seed {match['seed']})")
+        for problem in problems:
+            print(f"    {problem}")
+
+    suspects = suspected_bots(stats, args.max_hit_rate, args.min_attempts, args.max_coverage)
+    print(f"{len(suspects)} suspected bots")
+    if suspects:
+        print(f"  {'player':<24} {'rounds':>7} {'submitted':>10} {'hit rate':>9} {'coverage':>9}")
+    for name, player in suspects[:args.show]:
+        print(f"  {name:<24} {player.rounds:>7} {player.attempts:>10} "
+              f"{player.hits / max(player.attempts, 1):>9.1%} {player.coverage / player.rounds:>9.1%}")
+
+
+if __name__ == '__main__':
+    main()
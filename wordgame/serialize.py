@@ -0,0 +1,136 @@
+"""Room state for polling clients, encoded as JSON once per change
+
+Responses are joined from fragments, each the encoded inside of a JSON object
+built from some of a room's sections (see store.SECTIONS) and cached under
+their versions. Every client polling a room between two changes gets the same
+fragments without the room being read from the store or encoded again, and a
+finished game, which no longer changes, is encoded once. While a round is
+live only scores and word counts are sent; the words themselves go out with
+the results.
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from engine import determine_winners
+
+
+def encode_fields(fields):
+    """Encode a dict as the inside of a JSON object, ready to join with other fragments"""
+    return json.dumps(fields, separators=(',', ':'))[1:-1]
+
+
+def join_fragments(*fragments):
+    return '{' + ','.join(fragment for fragment in fragments if fragment) + '}'
+
+
+def board_fields(game):
+    fields = {'status': game['status']}
+    if game['status'] in ('playing', 'finished'):
+        fields['grid'] = game['grid']
+        if game['status'] == 'playing':
+            fields['end_time'] = game['round_end_time']
+            fields['word_filter'] = game['word_filter']
+    return fields
+
+
+def standings_fields(game):
+    return {'players': {
+        pid: {'name': pdata['name'], 'score': pdata['score'], 'word_count': len(pdata['words'])}
+        for pid, pdata in game['players'].items()
+    }}
+
+
+def final_fields(game):
+    if game['status'] != 'finished':
+        return {}
+    return {
+        'players': game['players'],
+        'winners': determine_winners(game['players']),
+        'missed_words': game['missed_words'],
+        'max_score': game['max_score']
+    }
+
+
+# Fragment name -> (sections it is built from, builder); the sections' versions are its cache key
+FRAGMENTS = {
+    # /api/game_status
+    'board': (('status',), board_fields),
+    'standings': (('players', 'scores'), standings_fields),
+    'final': (('status', 'players', 'scores', 'results'), final_fields),
+    # /api/events
+    'status': (('status',), lambda game: {'status': {
+        'status': game['status'],
+        'grid': game['grid'],
+        'end_time': game['round_end_time'],
+        'word_filter': game['word_filter']
+    }}),
+    'players': (('players',), lambda game: {'players': {
+        pid: {'name': pdata['name']} for pid, pdata in game['players'].items()
+    }}),
+    'scores': (('scores',), lambda game: {'scores': {
+        pid: {'score': pdata['score'], 'word_count': len(pdata['words'])}
+        for pid, pdata in game['players'].items()
+    }}),
+    'results': (('status', 'players', 'scores', 'results'), lambda game: {'results': final_fields(game)}
+                if game['status'] == 'finished' else {})
+}
+
+
+class RoomFragments:
+    """Least recently used cache of encoded room fragments
+
+    Holds up to JSON_CACHE_SIZE fragments; an entry is replaced as soon as
+    any section it was built from changes, so stale JSON is never served.
+    """
+
+    def __init__(self, store, max_entries=None):
+        self.store = store
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv('JSON_CACHE_SIZE', 20000))
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, room_code, versions, names):
+        """Return {name: fragment} for the named fragments, or None if the room is gone
+
+        versions must have been read before anything else about the room, so
+        a fragment is never cached under a newer version than its contents.
+        """
+        fragments = {}
+        missing = []
+        with self._lock:
+            for name in names:
+                key = (room_code, name)
+                version = tuple(versions[section] for section in FRAGMENTS[name][0])
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] == version:
+                    self._entries.move_to_end(key)
+                    fragments[name] = entry[1]
+                    self.hits += 1
+                else:
+                    missing.append((name, version))
+                    self.misses += 1
+        if not missing:
+            return fragments
+
+        # One read of the room builds every fragment that was missing
+        game = self.store.get_game(room_code)
+        if game is None:
+            return None
+        built = [(name, version, encode_fields(FRAGMENTS[name][1](game))) for name, version in missing]
+        with self._lock:
+            for name, version, fragment in built:
+                self._entries[(room_code, name)] = (version, fragment)
+                self._entries.move_to_end((room_code, name))
+                fragments[name] = fragment
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return fragments
+
+    def discard(self, room_code):
+        with self._lock:
+            for name in FRAGMENTS:
+                self._entries.pop((room_code, name), None)
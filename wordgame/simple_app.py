@@ -1,136 +1,43 @@
 import os
-import random
-import string
 import time
 import json
-from collections import defaultdict
-import nltk
+import threading
 from flask import Flask, render_template, request, jsonify, session
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-# Download nltk dictionary if not already downloaded
-nltk.download('words')
-from nltk.corpus import words as nltk_words
+from game_service import GameService, room_size
+from metrics import instrument_flask
+from serialize import RoomFragments, encode_fields, join_fragments
+from store import SECTIONS, changed_sections, format_versions, parse_versions
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev_key')
+# Latency of every route, served with the other metrics on /metrics
+instrument_flask(app)
 
-# Game state storage
-games = {}
-english_words = set(word.lower() for word in nltk_words.words() if len(word) >= 3)
+# Longest time /api/events holds a request open when nothing changes
+EVENTS_TIMEOUT = float(os.getenv('EVENTS_TIMEOUT', 25))
+# Most /api/events requests held open at once, each on its own server thread;
+# leaves a quarter of GUNICORN_THREADS for the other routes by default
+EVENTS_MAX_WAITING = int(os.getenv('EVENTS_MAX_WAITING', int(os.getenv('GUNICORN_THREADS', 100)) * 3 // 4))
+# Seconds a client turned away by EVENTS_MAX_WAITING waits before polling again
+EVENTS_RETRY_AFTER = 2
+waiting_polls = threading.BoundedSemaphore(EVENTS_MAX_WAITING)
 
-def generate_grid(size=4):
-    """Generate a random grid of letters with no duplicates"""
-    # Include more vowels to make grid more playable
-    vowels = 'aeiou'
-    consonants = ''.join(c for c in string.ascii_lowercase if c not in vowels)
-    
-    # Create a list of all available letters
-    all_letters = list(string.ascii_lowercase)
-    
-    # Select unique letters with preference for vowels
-    letters = []
-    # Target number of vowels (about 40% of the grid)
-    vowel_count = int(size*size*0.4)
-    
-    # First select vowels
-    available_vowels = [c for c in all_letters if c in vowels]
-    random.shuffle(available_vowels)
-    letters.extend(available_vowels[:vowel_count])
-    
-    # Remove selected vowels from available letters
-    for letter in letters:
-        all_letters.remove(letter)
-    
-    # Fill remaining spaces with consonants or other letters
-    random.shuffle(all_letters)
-    letters.extend(all_letters[:size*size - len(letters)])
-    
-    # Shuffle and reshape into grid
-    random.shuffle(letters)
-    grid = []
-    for i in range(0, size*size, size):
-        grid.append(letters[i:i+size])
-    
-    return grid
+def evict_room(room_code, reason):
+    """Drop the encoded state of a room the reaper deleted"""
+    room_json.discard(room_code)
 
-def calculate_score(word):
-    """Calculate word score - longer words are worth more points"""
-    length = len(word)
-    if length <= 3:
-        return 1
-    elif length == 4:
-        return 2
-    elif length == 5:
-        return 4
-    elif length == 6:
-        return 6
-    elif length == 7:
-        return 8
-    else:
-        return 10
+# Rooms, rounds and the background services behind them (see game_service.py);
+# clients poll for changes, so there is nothing to announce
+service = GameService(room_evicted=evict_room)
+store = service.store
 
-def is_word_in_grid(word, grid):
-    """Check if word can be formed from adjacent letters in the grid"""
-    size = len(grid)
-    word = word.lower()
-    
-    # Helper function to find all occurrences of the first letter
-    def find_starting_positions(letter):
-        positions = []
-        for i in range(size):
-            for j in range(size):
-                if grid[i][j] == letter:
-                    positions.append((i, j))
-        return positions
-    
-    # Helper function to check if we can form the word starting at position
-    def search_from_position(pos, remaining, used_positions):
-        row, col = pos
-        
-        # If we've used all letters, we found the word
-        if not remaining:
-            return True
-        
-        # Get the next letter to find
-        next_letter = remaining[0]
-        
-        # Check all adjacent cells
-        for dr in [-1, 0, 1]:
-            for dc in [-1, 0, 1]:
-                # Skip the current cell
-                if dr == 0 and dc == 0:
-                    continue
-                
-                # Calculate neighbor position
-                new_row, new_col = row + dr, col + dc
-                
-                # Check if the position is valid, has the right letter, and hasn't been used
-                if (0 <= new_row < size and 0 <= new_col < size and 
-                    grid[new_row][new_col] == next_letter and 
-                    (new_row, new_col) not in used_positions):
-                    
-                    # Try this path
-                    if search_from_position(
-                        (new_row, new_col), 
-                        remaining[1:], 
-                        used_positions + [(new_row, new_col)]):
-                        return True
-        
-        # If we get here, no path worked
-        return False
-    
-    # Try each possible starting position
-    start_positions = find_starting_positions(word[0])
-    for pos in start_positions:
-        if search_from_position(pos, word[1:], [pos]):
-            return True
-    
-    # If we get here, no valid path was found
-    return False
+# Encoded room state shared by every client polling a room (see serialize.py)
+room_json = RoomFragments(store)
 
 @app.route('/')
 def index():
@@ -139,26 +46,7 @@ def index():
 @app.route('/api/create_game', methods=['POST'])
 def create_game():
     player_name = request.json.get('name', 'Player')
-    
-    # Create a unique room code
-    while True:
-        room_code = ''.join(random.choices(string.ascii_uppercase, k=4))
-        if room_code not in games:
-            break
-    
-    # Initialize game
-    games[room_code] = {
-        'status': 'waiting',
-        'grid': None,
-        'round_end_time': None,
-        'players': {
-            1: {
-                'name': player_name,
-                'score': 0,
-                'words': []
-            }
-        }
-    }
+    room_code = service.create_room(1, player_name, room_size(request.json))
     
     session['player_id'] = 1
     session['room_code'] = room_code
@@ -174,30 +62,20 @@ def join_game():
     room_code = data.get('room_code', '').upper()
     player_name = data.get('name', 'Player')
     
-    if room_code not in games:
-        return jsonify({'error': 'Game not found'}), 404
-    
-    game = games[room_code]
-    
-    if game['status'] != 'waiting':
-        return jsonify({'error': 'Game already in progress'}), 400
-    
-    if len(game['players']) >= 2:
-        return jsonify({'error': 'Game is full'}), 400
-    
-    # Add player to game
-    player_id = 2  # Second player gets ID 2
-    game['players'][player_id] = {
-        'name': player_name,
-        'score': 0,
-        'words': []
-    }
+    # Add player to game (the creator is player 1, later players count up)
+    player_id = store.next_player_id(room_code)
+    error = store.add_player(room_code, player_id, player_name) if player_id else 'Game not found'
+    if error:
+        return jsonify({'error': error}), 404 if error == 'Game not found' else 400
     
     session['player_id'] = player_id
     session['room_code'] = room_code
     
-    # Start the game
-    start_game(room_code)
+    game = store.get_game(room_code)
+    
+    # Start the game as soon as the room is full
+    if len(game['players']) == game['max_players']:
+        service.start_round(room_code, 'waiting')
     
     return jsonify({
         'room_code': room_code,
@@ -205,138 +83,191 @@ def join_game():
         'players': [{'id': pid, 'name': pdata['name']} for pid, pdata in game['players'].items()]
     })
 
-def start_game(room_code):
-    game = games[room_code]
-    game['status'] = 'playing'
-    game['grid'] = generate_grid()
-    game['round_end_time'] = time.time() + 120  # 120 seconds round (2 minutes)
-    
-    # Reset player scores and words
-    for player in game['players'].values():
-        player['score'] = 0
-        player['words'] = []
+@app.route('/api/start_game', methods=['POST'])
+def start_game_early():
+    """Start a room before it is full, once at least two players are in"""
+    room_code = session.get('room_code')
+    player_id = session.get('player_id')
+    
+    game = store.get_game(room_code) if room_code else None
+    
+    if not player_id or game is None:
+        return jsonify({'error': 'Not in a game'}), 400
+    
+    if len(game['players']) < 2:
+        return jsonify({'error': 'Need at least two players'}), 400
+    
+    if not service.start_round(room_code, 'waiting'):
+        return jsonify({'error': 'Game already in progress'}), 400
+    
+    return jsonify({'status': 'started'})
+
+def json_body(body):
+    return app.response_class(body, mimetype='application/json')
 
 @app.route('/api/game_status', methods=['GET'])
 def game_status():
+    """Return the room's state, or with ?since=<version> only what changed since then
+    
+    While a round is live players carry their score and word count; the words
+    themselves come with the results once the game is finished.
+    """
     room_code = session.get('room_code')
     player_id = session.get('player_id')
     
-    if not room_code or not player_id or room_code not in games:
+    game = store.get_meta(room_code) if room_code else None
+    
+    if not player_id or game is None:
         return jsonify({'error': 'Not in a game'}), 400
     
-    game = games[room_code]
+    # Check if time is up
+    if game['status'] == 'playing' and time.time() > game['round_end_time']:
+        service.end_round(room_code)
     
-    response = {
-        'status': game['status'],
-        'player_id': player_id,
-        'players': game['players'],
-    }
+    versions = store.get_versions(room_code)
+    fragments = room_json.get(room_code, versions, ('board', 'standings', 'final')) if versions else None
     
-    if game['status'] in ['playing', 'finished']:
-        response['grid'] = game['grid']
-        
-        if game['status'] == 'playing':
-            response['end_time'] = game['round_end_time']
-            
-            # Check if time is up
-            if time.time() > game['round_end_time'] and game['status'] == 'playing':
-                process_game_end(room_code)
-                response['status'] = 'finished'
-                
-    if game['status'] == 'finished':
-        # Determine winner
-        max_score = -1
-        winners = []
-        
-        for pid, player_data in game['players'].items():
-            if player_data['score'] > max_score:
-                max_score = player_data['score']
-                winners = [pid]
-            elif player_data['score'] == max_score:
-                winners.append(pid)
-        
-        response['winners'] = winners
-    
-    return jsonify(response)
+    if fragments is None:
+        return jsonify({'error': 'Not in a game'}), 400
+    
+    response = encode_fields({'player_id': player_id, 'version': format_versions(versions)})
+    
+    # A finished game's results never change, so they are the same bytes for every poll
+    if fragments['final']:
+        return json_body(join_fragments(response, fragments['board'], fragments['final']))
+    
+    changed = SECTIONS
+    if 'since' in request.args:
+        changed = changed_sections(versions, parse_versions(request.args['since']))
+    
+    board = fragments['board'] if 'status' in changed else ''
+    standings = fragments['standings'] if 'players' in changed or 'scores' in changed else ''
+    return json_body(join_fragments(response, board, standings))
 
-@app.route('/api/submit_word', methods=['POST'])
-def submit_word():
+@app.route('/api/events', methods=['GET'])
+def events():
+    """Long-poll for room changes newer than the client's version token
+    
+    Returns as soon as something changes (or after EVENTS_TIMEOUT seconds) with
+    only the sections that changed, so idle clients cost one parked request.
+    Once EVENTS_MAX_WAITING requests are parked, the rest are answered at once
+    with 'retry_after', the seconds to wait before polling again.
+    """
     room_code = session.get('room_code')
     player_id = session.get('player_id')
-    word = request.json.get('word', '').lower()
+    since = parse_versions(request.args.get('since', ''))
+    
+    game = store.get_meta(room_code) if room_code else None
     
-    if not room_code or not player_id or room_code not in games:
+    if not player_id or game is None:
         return jsonify({'error': 'Not in a game'}), 400
     
-    game = games[room_code]
+    # Only park the request while a thread is spare for the other routes
+    if waiting_polls.acquire(blocking=False):
+        retry_after = None
+        # Wake up when the round is due to end so the results go out on time
+        timeout = EVENTS_TIMEOUT
+        if game['status'] == 'playing':
+            timeout = max(0, min(timeout, game['round_end_time'] - time.time()))
+        try:
+            versions = store.wait_for_change(room_code, since, timeout)
+        finally:
+            waiting_polls.release()
+    else:
+        retry_after = EVENTS_RETRY_AFTER
+        versions = store.get_versions(room_code)
     
-    if game['status'] != 'playing':
-        return jsonify({'error': 'Game not in progress'}), 400
+    # Check if time is up
+    game = store.get_meta(room_code)
+    if game and game['status'] == 'playing' and time.time() > game['round_end_time']:
+        service.end_round(room_code)
+        versions = store.get_versions(room_code)
     
-    if time.time() > game['round_end_time']:
-        process_game_end(room_code)
-        return jsonify({'error': 'Time is up'}), 400
+    if versions is None:
+        return jsonify({'error': 'Not in a game'}), 400
     
-    player = game['players'][player_id]
+    fields = {'version': format_versions(versions), 'player_id': player_id}
+    if retry_after is not None:
+        fields['retry_after'] = retry_after
+    response = encode_fields(fields)
+    changed = changed_sections(versions, since)
+    if not changed:
+        return json_body(join_fragments(response))
+    
+    # Sections are encoded once per change and shared by every client in the room
+    fragments = room_json.get(room_code, versions, changed)
+    if fragments is None:
+        return jsonify({'error': 'Not in a game'}), 400
     
-    # Check if word is already used by this player
-    if word in player['words']:
-        return jsonify({'valid': False, 'reason': 'Already used'})
+    return json_body(join_fragments(response, *(fragments[section] for section in changed)))
+
+def current_round():
+    """Return ((room code, player id, round fields), None) for the session's round
+    in progress, or (None, error response)"""
+    room_code = session.get('room_code')
+    player_id = session.get('player_id')
     
-    # Check if word is valid English
-    if word not in english_words:
-        return jsonify({'valid': False, 'reason': 'Not in dictionary'})
+    if not player_id or not room_code:
+        return None, (jsonify({'error': 'Not in a game'}), 400)
     
-    # Check if word can be formed from the grid
-    if not is_word_in_grid(word, game['grid']):
-        return jsonify({'valid': False, 'reason': 'Cannot be formed from grid'})
+    game, error = service.check_round(room_code)
+    if error:
+        return None, (jsonify({'error': error}), 400)
     
-    # Valid word, add to player's list and update score
-    score = calculate_score(word)
-    player['words'].append(word)
-    player['score'] += score
+    return (room_code, player_id, game), None
+
+@app.route('/api/submit_word', methods=['POST'])
+def submit_word():
+    current, error = current_round()
+    if error:
+        return error
     
-    return jsonify({
-        'valid': True,
-        'word': word,
-        'score': score,
-        'total_score': player['score']
-    })
+    room_code, player_id, game = current
+    word = str(request.json.get('word', ''))
+    return jsonify(service.submit_words(room_code, game, player_id, [word])[0])
 
-def process_game_end(room_code):
-    game = games[room_code]
-    game['status'] = 'finished'
-    
-    # Calculate final scores
-    word_owners = defaultdict(list)
-    for player_id, player_data in game['players'].items():
-        for word in player_data['words']:
-            word_owners[word].append(player_id)
-    
-    # Words found by more than one player are removed
-    for word, owners in word_owners.items():
-        if len(owners) > 1:
-            for player_id in owners:
-                if word in game['players'][player_id]['words']:
-                    game['players'][player_id]['words'].remove(word)
-                    # Subtract points
-                    game['players'][player_id]['score'] -= calculate_score(word)
+@app.route('/api/submit_words', methods=['POST'])
+def submit_words_batch():
+    """Several words in one request, answered with a result per word"""
+    current, error = current_round()
+    if error:
+        return error
+    
+    room_code, player_id, game = current
+    words = request.json.get('words')
+    return jsonify({'results': service.submit_words(room_code, game, player_id,
+                                                    words if isinstance(words, list) else [])})
+
+@app.route('/api/stats', methods=['GET'])
+def stats():
+    return jsonify(service.room_reaper.metrics())
+
+@app.route('/api/leaderboard', methods=['GET'])
+def leaderboard():
+    return jsonify({'leaderboard': service.match_history.leaderboard.top()})
+
+@app.route('/api/players/<name>', methods=['GET'])
+def player_history(name):
+    player = service.match_history.player(name)
+    if player is None:
+        return jsonify({'error': 'No games recorded for this player'}), 404
+    return jsonify(player)
 
 @app.route('/api/restart_game', methods=['POST'])
 def restart_game():
     room_code = session.get('room_code')
     player_id = session.get('player_id')
     
-    if not room_code or not player_id or room_code not in games:
-        return jsonify({'error': 'Not in a game'}), 400
+    game = store.get_meta(room_code) if room_code else None
     
-    game = games[room_code]
+    if not player_id or game is None:
+        return jsonify({'error': 'Not in a game'}), 400
     
     if game['status'] != 'finished':
         return jsonify({'error': 'Cannot restart - game not finished'}), 400
     
     # Reset game state
-    start_game(room_code)
+    service.start_round(room_code, 'finished')
     
     return jsonify({'status': 'restarted'})
 
@@ -5,10 +5,20 @@ document.addEventListener('DOMContentLoaded', () => {
     let gameGrid = null;
     let timerInterval = null;
     let foundWords = new Set();
+    let wordFilter = null;
+    let opponentScores = {};
+    let pendingWords = [];
+    let submitTimer = null;
+    // How long to wait for more words before sending a batch
+    const SUBMIT_WINDOW_MS = 150;
 
     // DOM elements
     const welcomeScreen = document.getElementById('welcome-screen');
     const createGameBtn = document.getElementById('create-game');
+    const createTournamentBtn = document.getElementById('create-tournament');
+    const maxPlayersSelect = document.getElementById('max-players');
+    const startGameBtn = document.getElementById('start-game');
+    const tournamentStatus = document.getElementById('tournament-status');
     const joinGameBtn = document.getElementById('join-game');
     const joinRoomInput = document.getElementById('join-room-code');
     const playerNameInput = document.getElementById('player-name');
@@ -34,7 +44,16 @@ document.addEventListener('DOMContentLoaded', () => {
     // Event listeners
     createGameBtn.addEventListener('click', () => {
         const playerName = playerNameInput.value.trim() || 'Player';
-        socket.emit('create_game', { name: playerName });
+        socket.emit('create_game', { name: playerName, max_players: parseInt(maxPlayersSelect.value) });
+    });
+
+    createTournamentBtn.addEventListener('click', () => {
+        const playerName = playerNameInput.value.trim() || 'Player';
+        socket.emit('create_tournament', { name: playerName, max_players: parseInt(maxPlayersSelect.value) });
+    });
+
+    startGameBtn.addEventListener('click', () => {
+        socket.emit('start_game', {});
     });
 
     joinGameBtn.addEventListener('click', () => {
@@ -86,6 +105,42 @@ document.addEventListener('DOMContentLoaded', () => {
         showScreen(waitingScreen);
     });
 
+    socket.on('tournament_created', (data) => {
+        playerId = data.player_id;
+        roomCode = data.room_code;
+        roomCodeDisplay.textContent = roomCode;
+        showTournamentStatus('Tournament lobby - start once everyone has joined');
+        showScreen(waitingScreen);
+    });
+
+    socket.on('tournament_joined', (data) => {
+        playerId = data.player_id;
+        roomCode = data.room_code;
+        roomCodeDisplay.textContent = roomCode;
+        updatePlayersList(data.players);
+        showTournamentStatus('Tournament lobby - start once everyone has joined');
+        showScreen(waitingScreen);
+    });
+
+    socket.on('tournament_stage', (data) => {
+        const rooms = Object.values(data.rooms);
+        const stillIn = rooms.some(players => players.some(player => player.id === playerId));
+        const bye = (data.byes || []).some(player => player.id === playerId);
+        
+        if (bye) {
+            showTournamentStatus(`Tournament stage ${data.stage}: you have a bye, ${rooms.length} room(s) playing`);
+        } else if (stillIn) {
+            showTournamentStatus(`Tournament stage ${data.stage}: ${rooms.length} room(s) playing`);
+        } else {
+            showTournamentStatus(`Tournament stage ${data.stage}: you are out, ${rooms.length} room(s) still playing`);
+        }
+    });
+
+    socket.on('tournament_ended', (data) => {
+        const names = data.champions.map(player => player.id === playerId ? 'You' : player.name);
+        showTournamentStatus(names.length ? `Tournament winner: ${names.join(', ')} 🏆` : 'Tournament over');
+    });
+
     socket.on('player_joined', (data) => {
         const playerItem = document.createElement('div');
         playerItem.classList.add('player-item');
@@ -110,32 +165,35 @@ document.addEventListener('DOMContentLoaded', () => {
         gameGrid = data.grid;
         createGameGrid(gameGrid);
         resetGameState();
+        wordFilter = WordFilter.load(data.word_filter);
         startTimer(Math.floor(data.end_time - (Date.now() / 1000)));
         showScreen(gameScreen);
     });
 
-    socket.on('word_result', (data) => {
-        if (data.valid) {
-            foundWords.add(data.word);
-            playerScore.textContent = data.total_score;
-            
-            // Add word to list
-            const wordItem = document.createElement('li');
-            wordItem.textContent = `${data.word} (+${data.score})`;
-            foundWordsList.appendChild(wordItem);
-            
-            showMessage(`Found "${data.word}" for ${data.score} points!`, 'success');
-        } else {
-            showMessage(`Invalid word: ${data.reason}`, 'error');
-        }
-        
-        wordInput.value = '';
-        wordInput.focus();
+    socket.on('word_result', handleWordResult);
+
+    socket.on('word_results', (data) => {
+        data.results.forEach(handleWordResult);
     });
 
-    socket.on('opponent_found_word', (data) => {
-        opponentScore.textContent = data.score;
-        showMessage(`${data.name} found a ${data.word_length}-letter word`, 'info');
+    socket.on('opponents_found_words', (data) => {
+        // Updates arrive batched per room, including our own, which we skip
+        const updates = data.updates.filter(update => update.player_id !== playerId);
+        if (updates.length === 0) {
+            return;
+        }
+        
+        updates.forEach(update => {
+            opponentScores[update.player_id] = update.score;
+        });
+        opponentScore.textContent = Math.max(...Object.values(opponentScores));
+        
+        const last = updates[updates.length - 1];
+        if (updates.length === 1) {
+            showMessage(`${last.name} found a ${last.word_length}-letter word`, 'info');
+        } else {
+            showMessage(`Opponents found ${updates.length} words`, 'info');
+        }
     });
 
     socket.on('game_ended', (data) => {
@@ -170,6 +228,23 @@ document.addEventListener('DOMContentLoaded', () => {
             resultsHTML += '</div>';
         }
         
+        // Words on the board that nobody found
+        resultsHTML += '<div class="player-result missed">';
+        resultsHTML += `<h4>Words nobody found</h4>`;
+        if (data.max_score !== null) {
+            resultsHTML += `<p>Best possible score: ${data.max_score}</p>`;
+        }
+        if (data.missed_words.length > 0) {
+            resultsHTML += '<ul>';
+            data.missed_words.forEach(word => {
+                resultsHTML += `<li>${word}</li>`;
+            });
+            resultsHTML += '</ul>';
+        } else {
+            resultsHTML += '<p>Every word was found!</p>';
+        }
+        resultsHTML += '</div>';
+        
         // Set results and show game over screen
         gameResults.innerHTML = resultsHTML;
         showScreen(gameOverScreen);
@@ -213,6 +288,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
     function resetGameState() {
         foundWords.clear();
+        opponentScores = {};
         foundWordsList.innerHTML = '';
         playerScore.textContent = '0';
         opponentScore.textContent = '0';
@@ -250,13 +326,59 @@ document.addEventListener('DOMContentLoaded', () => {
     function submitWord() {
         const word = wordInput.value.trim().toLowerCase();
         
-        if (word.length >= 3) {
-            socket.emit('submit_word', { word });
-        } else {
+        if (word.length < 3) {
             showMessage('Word must be at least 3 letters', 'error');
+            return;
+        }
+        
+        wordInput.value = '';
+        wordInput.focus();
+        
+        // Words the board's filter rules out never need to reach the server
+        if (foundWords.has(word)) {
+            showMessage('Invalid word: Already used', 'error');
+        } else if (!WordFilter.mightContain(wordFilter, word)) {
+            showMessage('Invalid word: Not a word on this board', 'error');
+        } else {
+            queueWord(word);
         }
     }
 
+    // Words typed in quick succession are sent together in one event
+    function queueWord(word) {
+        pendingWords.push(word);
+        if (submitTimer === null) {
+            submitTimer = setTimeout(flushWords, SUBMIT_WINDOW_MS);
+        }
+    }
+
+    function flushWords() {
+        socket.emit('submit_words', { words: pendingWords });
+        pendingWords = [];
+        submitTimer = null;
+    }
+
+    function handleWordResult(data) {
+        if (data.valid) {
+            foundWords.add(data.word);
+            playerScore.textContent = data.total_score;
+            
+            // Add word to list
+            const wordItem = document.createElement('li');
+            wordItem.textContent = `${data.word} (+${data.score})`;
+            foundWordsList.appendChild(wordItem);
+            
+            showMessage(`Found "${data.word}" for ${data.score} points!`, 'success');
+        } else {
+            showMessage(`Invalid word: ${data.reason}`, 'error');
+        }
+    }
+
+    function showTournamentStatus(text) {
+        tournamentStatus.textContent = text;
+        tournamentStatus.style.display = 'block';
+    }
+
     function showMessage(text, type = 'info') {
         gameMessage.textContent = text;
         gameMessage.className = `message ${type}`;
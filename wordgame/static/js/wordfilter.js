@@ -0,0 +1,45 @@
+// Bloom filter of a board's valid words, as built by engine/wordfilter.py. The hashes
+// must match the server's exactly, so keep the two files in step.
+const WordFilter = (() => {
+    const FNV_PRIME = 16777619;
+    const SEEDS = [2166136261, 0x9747B28C];
+
+    function fnv1a(word, seed) {
+        let value = seed;
+        for (const byte of new TextEncoder().encode(word)) {
+            value = Math.imul(value ^ byte, FNV_PRIME) >>> 0;
+        }
+        // MurmurHash3's finalizer, as on the server
+        value = Math.imul(value ^ (value >>> 16), 0x85EBCA6B) >>> 0;
+        value = Math.imul(value ^ (value >>> 13), 0xC2B2AE35) >>> 0;
+        return (value ^ (value >>> 16)) >>> 0;
+    }
+
+    // Decode the {bits, size, hashes} payload sent with the round (null if none)
+    function load(payload) {
+        if (!payload) {
+            return null;
+        }
+        const bits = Uint8Array.from(atob(payload.bits), c => c.charCodeAt(0));
+        return { bits, size: payload.size, hashes: payload.hashes };
+    }
+
+    // False means the word is definitely not on the board; true means it
+    // probably is, and the server makes the final call
+    function mightContain(filter, word) {
+        if (!filter) {
+            return true;
+        }
+        const first = fnv1a(word, SEEDS[0]);
+        const second = fnv1a(word, SEEDS[1]);
+        for (let i = 0; i < filter.hashes; i++) {
+            const position = (first + i * second) % filter.size;
+            if (!(filter.bits[position >> 3] & (1 << (position & 7)))) {
+                return false;
+            }
+        }
+        return true;
+    }
+
+    return { load, mightContain };
+})();
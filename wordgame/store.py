@@ -0,0 +1,966 @@
+import copy
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+
+from codes import RoomCodes
+
+# A game snapshot returned by get_game() looks like:
+#   {'status': 'waiting' | 'playing' | 'finished',
+#    'grid': [[...]], 'round_end_time': float, 'solved': bool,
+#    'max_score': int, 'missed_words': [...],
+#    'word_filter': Bloom filter of the solutions for clients, or None,
+#    'max_players': int, 'tournament': tournament code or None,
+#    'players': {player_id: {'name': str, 'score': int, 'words': [...]}},
+#    'solutions': set (only with include_solutions=True)}
+# Knockout tournaments (see tournament.py) are stored as one small state dict
+# per tournament code, changed only through update_tournament().
+# Snapshots are copies; all changes go through the store methods so that each
+# one is a single atomic update no matter which worker makes it.
+#
+# Finished rooms are compacted once their results are saved: the solution set
+# and per-player duplicate checks are dropped, since no more words can arrive.
+#
+# Rooms remember when they last changed so idle ones can be reaped (see
+# reap() and reaper.py); reads do not count as activity.
+#
+# Every room also carries a change counter per section, bumped by the updates
+# that touch it, so pollers can fetch only what changed:
+#   status   status, grid, round_end_time
+#   players  who is in the room
+#   scores   live scores and word counts
+#   results  final word lists and missed words
+SECTIONS = ('status', 'players', 'scores', 'results')
+
+
+def parse_versions(token):
+    """Parse a version token from a client ('' or malformed means it has nothing yet)"""
+    try:
+        versions = [int(part) for part in token.split('.')]
+    except (AttributeError, ValueError):
+        versions = []
+    if len(versions) != len(SECTIONS):
+        versions = [0] * len(SECTIONS)
+    return dict(zip(SECTIONS, versions))
+
+
+def format_versions(versions):
+    return '.'.join(str(versions[section]) for section in SECTIONS)
+
+
+def changed_sections(versions, since):
+    return [section for section in SECTIONS if versions[section] > since[section]]
+
+
+class RoomNotifier:
+    """Wakes threads waiting for a particular room to change"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # room code -> [condition, change count, waiter count]
+        self._rooms = {}
+
+    def notify(self, room_code):
+        with self._lock:
+            entry = self._rooms.get(room_code)
+            if entry is not None:
+                entry[1] += 1
+                entry[0].notify_all()
+
+    def notify_all(self):
+        """Wake every waiter to check again, for when notifications may have been missed"""
+        with self._lock:
+            for entry in self._rooms.values():
+                entry[1] += 1
+                entry[0].notify_all()
+
+    def wait(self, room_code, check, timeout):
+        """Block until check() is true or timeout passes; waiters for other rooms are never woken"""
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            entry = self._rooms.setdefault(room_code, [threading.Condition(self._lock), 0, 0])
+            entry[2] += 1
+        try:
+            while True:
+                # Read the change count before checking so a change made while
+                # check() runs still wakes us up
+                with self._lock:
+                    seen = entry[1]
+                remaining = deadline - time.monotonic()
+                if check() or remaining <= 0:
+                    return
+                with self._lock:
+                    if entry[1] == seen:
+                        entry[0].wait(remaining)
+        finally:
+            with self._lock:
+                entry[2] -= 1
+                if not entry[2]:
+                    del self._rooms[room_code]
+
+
+def wait_for_change(store, room_code, since, timeout):
+    """Wait until any section of a room is newer than since; returns the current versions"""
+    store.notifier.wait(room_code, lambda: _room_changed(store, room_code, since), timeout)
+    return store.get_versions(room_code)
+
+
+def _room_changed(store, room_code, since):
+    versions = store.get_versions(room_code)
+    return versions is None or bool(changed_sections(versions, since))
+
+
+def deep_size(obj, seen=None):
+    """Approximate bytes held by obj and everything it references"""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if hasattr(obj, '__slots__'):
+        size += sum(deep_size(getattr(obj, name), seen) for name in obj.__slots__)
+    elif isinstance(obj, dict):
+        size += sum(deep_size(key, seen) + deep_size(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_size(item, seen) for item in obj)
+    return size
+
+
+def create_store(url=None):
+    """Return the game store configured by GAME_STORE_URL (in-process if unset)"""
+    url = url or os.getenv('GAME_STORE_URL')
+    if url:
+        return RedisGameStore.from_url(url)
+    return MemoryGameStore()
+
+
+class Player:
+    """One player's state in an in-memory room
+
+    words is an ordered set (a dict with no values): membership checks are
+    O(1) and the words still come back in the order they were found.
+    """
+
+    __slots__ = ('name', 'score', 'words')
+
+    def __init__(self, name):
+        self.name = name
+        self.score = 0
+        self.words = {}
+
+    def add_word(self, word, score):
+        """Record a word; False if this player already has it"""
+        if word in self.words:
+            return False
+        self.words[word] = None
+        self.score += score
+        return True
+
+    def reset(self):
+        self.score = 0
+        self.words = {}
+
+    def snapshot(self):
+        return {'name': self.name, 'score': self.score, 'words': list(self.words)}
+
+
+class MemoryGameStore:
+    """Game state kept in this process (single worker deployments)"""
+
+    def __init__(self):
+        self.games = {}
+        self.player_rooms = {}
+        self.notifier = RoomNotifier()
+        self._lock = threading.RLock()
+        # Room code -> time of its last change, least recently changed first
+        self._activity = OrderedDict()
+        self.codes = RoomCodes()
+        self._next_code = 0
+        self._free_codes = deque()
+        self.tournaments = {}
+
+    def _bump(self, room_code, *sections):
+        versions = self.games[room_code]['versions']
+        for section in sections:
+            versions[section] += 1
+        self._activity[room_code] = time.time()
+        self._activity.move_to_end(room_code)
+        self.notifier.notify(room_code)
+
+    def allocate_code(self):
+        """Return an unused room code: never-used codes first, then those of deleted rooms"""
+        with self._lock:
+            if self._next_code >= self.codes.size and self._free_codes:
+                return self._free_codes.popleft()
+            self._next_code += 1
+            return self.codes.code(self._next_code - 1)
+
+    def create_game(self, room_code, player_id, player_name, max_players=2, tournament=None):
+        """Create a waiting room with its first player; False if the code is taken"""
+        with self._lock:
+            if room_code in self.games or room_code in self.tournaments:
+                return False
+            self.games[room_code] = {
+                'status': 'waiting',
+                'grid': None,
+                'round_end_time': None,
+                'seed': None,
+                'solutions': None,
+                'max_score': None,
+                'word_filter': None,
+                'missed_words': [],
+                'submissions': [],
+                'max_players': max_players,
+                'tournament': tournament,
+                'next_player_id': 1,
+                'players': {player_id: Player(player_name)},
+                'versions': dict.fromkeys(SECTIONS, 0)
+            }
+            self._bump(room_code, 'status', 'players', 'scores')
+            return True
+
+    def get_game(self, room_code, include_solutions=False):
+        with self._lock:
+            game = self.games.get(room_code)
+            if game is None:
+                return None
+            snapshot = {key: value for key, value in game.items()
+                        if key not in ('solutions', 'submissions', 'versions', 'next_player_id')}
+            snapshot['solved'] = game['solutions'] is not None
+            snapshot['missed_words'] = list(game['missed_words'])
+            snapshot['players'] = {pid: player.snapshot() for pid, player in game['players'].items()}
+            if include_solutions:
+                snapshot['solutions'] = game['solutions']
+            return snapshot
+
+    def get_meta(self, room_code):
+        """Return just the round fields needed on the submission hot path"""
+        with self._lock:
+            game = self.games.get(room_code)
+            if game is None:
+                return None
+            return {
+                'status': game['status'],
+                'round_end_time': game['round_end_time'],
+                'grid': game['grid'],
+                'solved': game['solutions'] is not None,
+                'max_players': game['max_players'],
+                'tournament': game['tournament']
+            }
+
+    def get_versions(self, room_code):
+        """Return the per-section change counters of a room, or None if it is gone"""
+        with self._lock:
+            game = self.games.get(room_code)
+            return dict(game['versions']) if game else None
+
+    def wait_for_change(self, room_code, since, timeout):
+        return wait_for_change(self, room_code, since, timeout)
+
+    def next_player_id(self, room_code):
+        """Return a new numeric player id for a room (the creator has id 1), or None"""
+        with self._lock:
+            game = self.games.get(room_code)
+            if game is None:
+                return None
+            game['next_player_id'] += 1
+            return game['next_player_id']
+
+    def add_player(self, room_code, player_id, player_name):
+        """Add a player to a waiting room; returns an error message or None"""
+        with self._lock:
+            game = self.games.get(room_code)
+            if game is None:
+                return 'Game not found'
+            if game['status'] != 'waiting':
+                return 'Game already in progress'
+            if len(game['players']) >= game['max_players']:
+                return 'Game is full'
+            game['players'][player_id] = Player(player_name)
+            self._bump(room_code, 'players', 'scores')
+            return None
+
+    def remove_player(self, room_code, player_id):
+        """Remove a player and return how many are left"""
+        with self._lock:
+            game = self.games.get(room_code)
+            if game is None:
+                return 0
+            game['players'].pop(player_id, None)
+            self._bump(room_code, 'players', 'scores')
+            return len(game['players'])
+
+    def get_player_name(self, room_code, player_id):
+        with self._lock:
+            return self.games[room_code]['players'][player_id].name
+
+    def delete_game(self, room_code):
+        """Delete a room and forget which room its players were in"""
+        with self._lock:
+            game = self.games.pop(room_code, None)
+            self._activity.pop(room_code, None)
+            if game is not None:
+                for pid in game['players']:
+                    if self.player_rooms.get(pid) == room_code:
+                        del self.player_rooms[pid]
+                self._free_codes.append(room_code)
+            self.notifier.notify(room_code)
+
+    def reap(self, ttls, max_rooms, now=None):
+        """Delete idle rooms, then the least recently changed beyond max_rooms
+
+        ttls maps each status to the seconds a room may go unchanged in it.
+        Returns a (room code, 'idle' or 'capacity') pair for every room deleted.
+        """
+        now = time.time() if now is None else now
+        cutoff = now - min(ttls.values())
+        with self._lock:
+            # Only rooms older than the shortest TTL can have expired
+            expired = []
+            for room_code, changed in self._activity.items():
+                if changed > cutoff:
+                    break
+                if changed <= now - ttls[self.games[room_code]['status']]:
+                    expired.append(room_code)
+            reaped = [(room_code, 'idle') for room_code in expired]
+
+            for room_code in expired:
+                self.delete_game(room_code)
+            while len(self.games) > max_rooms:
+                room_code = next(iter(self._activity))
+                self.delete_game(room_code)
+                reaped.append((room_code, 'capacity'))
+            return reaped
+
+    def room_count(self):
+        return len(self.games)
+
+    def player_count(self):
+        with self._lock:
+            return sum(len(game['players']) for game in self.games.values())
+
+    def bytes_per_room(self, sample=20):
+        """Average in-memory size of the most recently changed rooms"""
+        with self._lock:
+            rooms = [self.games[room_code] for room_code in reversed(self._activity)][:sample]
+            if not rooms:
+                return 0
+            return sum(deep_size(game) for game in rooms) // len(rooms)
+
+    def start_round(self, room_code, board, end_time, expected_status):
+        """Start a round on a board if the room is still in expected_status"""
+        with self._lock:
+            game = self.games.get(room_code)
+            if game is None or game['status'] != expected_status:
+                return False
+            game['status'] = 'playing'
+            game['grid'] = board.grid
+            game['seed'] = board.seed
+            game['solutions'] = board.solutions
+            game['max_score'] = board.max_score
+            game['word_filter'] = board.word_filter
+            game['missed_words'] = []
+            game['submissions'] = []
+            game['round_end_time'] = end_time
+
+            # Reset player scores and words
+            for player in game['players'].values():
+                player.reset()
+            self._bump(room_code, 'status', 'scores')
+            return True
+
+    def check_solutions(self, room_code, words):
+        """Return whether each word is findable on the room's board, or None if
+        its round is not in progress (a finished room has no solutions left)"""
+        with self._lock:
+            game = self.games.get(room_code)
+            if game is None or game['status'] != 'playing':
+                return None
+            return [word in game['solutions'] for word in words]
+
+    def add_words(self, room_code, player_id, words):
+        """Record (word, score) pairs in order; returns the running total after
+        each one, or None for a word the player already had
+
+        Returns None instead if the round is not in progress or the player has
+        left, so nothing changes a round once it has been scored.
+        """
+        with self._lock:
+            game = self.games.get(room_code)
+            if game is None or game['status'] != 'playing' or player_id not in game['players']:
+                return None
+            player = game['players'][player_id]
+            totals = [player.score if player.add_word(word, score) else None for word, score in words]
+            if any(total is not None for total in totals):
+                self._bump(room_code, 'scores')
+            return totals
+
+    def log_submissions(self, room_code, player_id, words, submitted_at):
+        """Append a batch of submitted words, valid or not, to the round's log"""
+        with self._lock:
+            game = self.games.get(room_code)
+            if game is not None and game['status'] == 'playing':
+                game['submissions'].append((submitted_at, player_id, list(words)))
+
+    def get_submissions(self, room_code):
+        """Return the round's log as (submitted_at, player id, words) in the order logged"""
+        with self._lock:
+            game = self.games.get(room_code)
+            return list(game['submissions']) if game else []
+
+    def finish_game(self, room_code):
+        """Move a playing room to finished; True only for the caller that did it"""
+        with self._lock:
+            game = self.games.get(room_code)
+            if game is None or game['status'] != 'playing':
+                return False
+            game['status'] = 'finished'
+            self._bump(room_code, 'status')
+            return True
+
+    def save_results(self, room_code, players, missed_words):
+        """Store final scores and word lists after cancellation"""
+        with self._lock:
+            game = self.games.get(room_code)
+            if game is None:
+                return
+            for pid, result in players.items():
+                player = game['players'].get(pid)
+                if player is not None:
+                    player.score = result['score']
+                    player.words = dict.fromkeys(result['words'])
+            game['missed_words'] = tuple(missed_words)
+            # The round is over, so the solutions and their filter are no longer needed, nor
+            # the submission log (finish_round has already read it for the match history)
+            game['solutions'] = None
+            game['word_filter'] = None
+            game['submissions'] = []
+            self._bump(room_code, 'scores', 'results')
+
+    def create_tournament(self, code, state):
+        """Store a new tournament; False if the code is taken"""
+        with self._lock:
+            if code in self.tournaments or code in self.games:
+                return False
+            self.tournaments[code] = copy.deepcopy(state)
+            return True
+
+    def get_tournament(self, code):
+        with self._lock:
+            state = self.tournaments.get(code)
+            return copy.deepcopy(state) if state is not None else None
+
+    def update_tournament(self, code, update):
+        """Apply update(state) atomically and return its result (None if there is no such tournament)"""
+        with self._lock:
+            state = self.tournaments.get(code)
+            if state is None:
+                return None
+            return update(state)
+
+    def delete_tournament(self, code):
+        with self._lock:
+            if self.tournaments.pop(code, None) is not None:
+                self._free_codes.append(code)
+
+    def set_player_room(self, player_id, room_code):
+        with self._lock:
+            self.player_rooms[player_id] = room_code
+
+    def get_player_room(self, player_id):
+        with self._lock:
+            return self.player_rooms.get(player_id)
+
+    def delete_player_room(self, player_id):
+        with self._lock:
+            self.player_rooms.pop(player_id, None)
+
+
+# Records a player's found words, only while the room's round is in progress
+# and the player is still in it. KEYS are the room hash, the players hash, the
+# player's word set, word list and the scores hash, then the rooms index; ARGV
+# is the player id, room code, the time and the change channel, then each
+# word and its score. Returns the player's running total after each word, -1
+# for a word they already had, or nil if the round is not in progress.
+ADD_WORDS_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'status') ~= 'playing' or redis.call('HEXISTS', KEYS[2], ARGV[1]) == 0 then
+    return nil
+end
+local totals = {}
+local added = false
+for i = 5, #ARGV, 2 do
+    if redis.call('SADD', KEYS[3], ARGV[i]) == 1 then
+        redis.call('RPUSH', KEYS[4], ARGV[i])
+        totals[#totals + 1] = redis.call('HINCRBY', KEYS[5], ARGV[1], ARGV[i + 1])
+        added = true
+    else
+        totals[#totals + 1] = -1
+    end
+end
+if added then
+    redis.call('HINCRBY', KEYS[1], 'v:scores', 1)
+    redis.call('ZADD', KEYS[6], ARGV[3], ARGV[2])
+    redis.call('PUBLISH', ARGV[4], ARGV[2])
+end
+return totals
+"""
+
+
+class RedisGameStore:
+    """Game state kept in a Redis-protocol server, shared by every worker
+
+    Each room is a handful of keys so updates touch only what changed:
+      wordgame:room:<code>                 hash   status, grid, round_end_time, ...
+      wordgame:room:<code>:players         hash   player id -> name
+      wordgame:room:<code>:scores          hash   player id -> score
+      wordgame:room:<code>:words:<id>      list   words in the order found
+      wordgame:room:<code>:wordset:<id>    set    same words, for duplicate checks
+      wordgame:room:<code>:solutions       set    every findable word
+      wordgame:room:<code>:submissions     list   the round's submitted batches as JSON, until it is scored
+      wordgame:player:<id>                 string room code
+      wordgame:rooms                       zset   room code -> time of last change
+      wordgame:codes:next                  string next position in the room code sequence
+      wordgame:codes:free                  list   codes of deleted rooms, oldest first
+      wordgame:tournament:<code>           string tournament state as JSON
+    Player ids are stored JSON encoded so int and str ids round-trip unchanged.
+    Section versions live in the room hash as v:<section>, and every change is
+    published on wordgame:changes so waiting pollers on any worker wake up.
+    """
+
+    PREFIX = 'wordgame'
+    CHANNEL = 'wordgame:changes'
+    ROOMS = 'wordgame:rooms'
+    NEXT_CODE = 'wordgame:codes:next'
+    FREE_CODES = 'wordgame:codes:free'
+    # Seconds between attempts to resubscribe to CHANNEL, doubling up to the maximum
+    RESUBSCRIBE_DELAY = 0.5
+    MAX_RESUBSCRIBE_DELAY = 30
+
+    def __init__(self, client):
+        self.redis = client
+        self.notifier = RoomNotifier()
+        self.codes = RoomCodes()
+        self._listener = None
+        self._listener_lock = threading.Lock()
+        self._add_words = client.register_script(ADD_WORDS_SCRIPT)
+
+    @classmethod
+    def from_url(cls, url):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('GAME_STORE_URL is set but the redis package is not installed')
+        return cls(redis.Redis.from_url(url, decode_responses=True))
+
+    def _room(self, room_code, *parts):
+        return ':'.join((self.PREFIX, 'room', room_code) + parts)
+
+    def _pid(self, player_id):
+        return json.dumps(player_id)
+
+    def _bump(self, pipe, room_code, *sections):
+        for section in sections:
+            pipe.hincrby(self._room(room_code), f"v:{section}", 1)
+        pipe.zadd(self.ROOMS, {room_code: time.time()})
+        pipe.publish(self.CHANNEL, room_code)
+
+    def _listen(self):
+        """Relay change notifications to local waiters, resubscribing if the connection drops"""
+        delay = self.RESUBSCRIBE_DELAY
+        while True:
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(self.CHANNEL)
+                delay = self.RESUBSCRIBE_DELAY
+                # Anything published while we were not subscribed was missed
+                self.notifier.notify_all()
+                for message in pubsub.listen():
+                    self.notifier.notify(message['data'])
+            except Exception as exc:
+                print(f"Lost the store's change notifications, resubscribing in {delay:g}s: {exc!r}")
+            finally:
+                pubsub.close()
+            time.sleep(delay)
+            delay = min(delay * 2, self.MAX_RESUBSCRIBE_DELAY)
+
+    def _transaction(self, func, *keys):
+        """Run func(pipe) under WATCH on keys, retrying if another worker got there first"""
+        return self.redis.transaction(func, *keys, value_from_callable=True)
+
+    def allocate_code(self):
+        """Return an unused room code: never-used codes first, then those of deleted rooms
+
+        The sequence position is a shared counter, so workers never hand out
+        the same fresh code.
+        """
+        if int(self.redis.get(self.NEXT_CODE) or 0) >= self.codes.size:
+            room_code = self.redis.lpop(self.FREE_CODES)
+            if room_code is not None:
+                return room_code
+        return self.codes.code(self.redis.incr(self.NEXT_CODE) - 1)
+
+    def create_game(self, room_code, player_id, player_name, max_players=2, tournament=None):
+        key, tournament_key = self._room(room_code), self._tournament_key(room_code)
+        pid = self._pid(player_id)
+
+        # The whole room is written at once, so nobody sees it half created
+        def create(pipe):
+            if pipe.exists(key, tournament_key):
+                return False
+            pipe.multi()
+            pipe.hset(key, mapping={'status': 'waiting', 'grid': 'null', 'round_end_time': 'null', 'seed': 'null',
+                                    'solved': '0', 'max_score': 'null', 'word_filter': 'null', 'missed_words': '[]',
+                                    'max_players': max_players,
+                                    'tournament': json.dumps(tournament), 'next_player_id': 1})
+            pipe.hset(self._room(room_code, 'players'), pid, player_name)
+            pipe.hset(self._room(room_code, 'scores'), pid, 0)
+            self._bump(pipe, room_code, 'status', 'players', 'scores')
+            return True
+
+        return self._transaction(create, key, tournament_key)
+
+    def get_game(self, room_code, include_solutions=False):
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hgetall(self._room(room_code))
+        pipe.hgetall(self._room(room_code, 'players'))
+        pipe.hgetall(self._room(room_code, 'scores'))
+        if include_solutions:
+            pipe.smembers(self._room(room_code, 'solutions'))
+        results = pipe.execute()
+        fields, names, scores = results[:3]
+        if 'status' not in fields:
+            return None
+
+        pipe = self.redis.pipeline(transaction=False)
+        for pid in names:
+            pipe.lrange(self._room(room_code, 'words', pid), 0, -1)
+        word_lists = pipe.execute()
+
+        game = {
+            'status': fields['status'],
+            'grid': json.loads(fields['grid']),
+            'round_end_time': json.loads(fields['round_end_time']),
+            'seed': json.loads(fields.get('seed', 'null')),
+            'solved': fields['solved'] == '1',
+            'max_score': json.loads(fields['max_score']),
+            'word_filter': json.loads(fields['word_filter']),
+            'missed_words': json.loads(fields['missed_words']),
+            'max_players': int(fields['max_players']),
+            'tournament': json.loads(fields['tournament']),
+            'players': {
+                json.loads(pid): {'name': name, 'score': int(scores.get(pid, 0)), 'words': words}
+                for (pid, name), words in zip(names.items(), word_lists)
+            }
+        }
+        if include_solutions:
+            game['solutions'] = results[3] if game['solved'] else None
+        return game
+
+    def get_meta(self, room_code):
+        status, end_time, grid, solved, max_players, tournament = self.redis.hmget(
+            self._room(room_code), 'status', 'round_end_time', 'grid', 'solved', 'max_players', 'tournament')
+        if status is None:
+            return None
+        return {
+            'status': status,
+            'round_end_time': json.loads(end_time),
+            'grid': json.loads(grid),
+            'solved': solved == '1',
+            'max_players': int(max_players),
+            'tournament': json.loads(tournament)
+        }
+
+    def get_versions(self, room_code):
+        status, *versions = self.redis.hmget(
+            self._room(room_code), 'status', *(f"v:{section}" for section in SECTIONS))
+        if status is None:
+            return None
+        return {section: int(version or 0) for section, version in zip(SECTIONS, versions)}
+
+    def wait_for_change(self, room_code, since, timeout):
+        with self._listener_lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen, name='store-listener', daemon=True)
+                self._listener.start()
+        return wait_for_change(self, room_code, since, timeout)
+
+    def next_player_id(self, room_code):
+        key = self._room(room_code)
+        if not self.redis.hexists(key, 'status'):
+            return None
+        return self.redis.hincrby(key, 'next_player_id', 1)
+
+    def add_player(self, room_code, player_id, player_name):
+        key, players = self._room(room_code), self._room(room_code, 'players')
+        pid = self._pid(player_id)
+
+        def add(pipe):
+            status, max_players = pipe.hmget(key, 'status', 'max_players')
+            if status is None:
+                return 'Game not found'
+            if status != 'waiting':
+                return 'Game already in progress'
+            if pipe.hlen(players) >= int(max_players):
+                return 'Game is full'
+            pipe.multi()
+            pipe.hset(players, pid, player_name)
+            pipe.hset(self._room(room_code, 'scores'), pid, 0)
+            self._bump(pipe, room_code, 'players', 'scores')
+            return None
+
+        return self._transaction(add, key, players)
+
+    def remove_player(self, room_code, player_id):
+        key, players = self._room(room_code), self._room(room_code, 'players')
+        pid = self._pid(player_id)
+
+        # delete_game removes the players hash, so watching it stops a deleted room coming back
+        def remove(pipe):
+            if not pipe.exists(key) or not pipe.hexists(players, pid):
+                return pipe.hlen(players)
+            remaining = pipe.hlen(players) - 1
+            pipe.multi()
+            pipe.hdel(players, pid)
+            pipe.hdel(self._room(room_code, 'scores'), pid)
+            pipe.delete(self._room(room_code, 'words', pid), self._room(room_code, 'wordset', pid))
+            self._bump(pipe, room_code, 'players', 'scores')
+            return remaining
+
+        return self._transaction(remove, players)
+
+    def get_player_name(self, room_code, player_id):
+        return self.redis.hget(self._room(room_code, 'players'), self._pid(player_id))
+
+    def _room_keys(self, room_code, pids):
+        keys = [self._room(room_code), self._room(room_code, 'players'),
+                self._room(room_code, 'scores'), self._room(room_code, 'solutions'),
+                self._room(room_code, 'submissions')]
+        for pid in pids:
+            keys += [self._room(room_code, 'words', pid), self._room(room_code, 'wordset', pid)]
+        return keys
+
+    def _player_key(self, player_id):
+        return f"{self.PREFIX}:player:{player_id}"
+
+    def delete_game(self, room_code):
+        """Delete a room and forget which room its players were in"""
+        pids = self.redis.hkeys(self._room(room_code, 'players'))
+        pipe = self.redis.pipeline()
+        pipe.delete(self._room(room_code))
+        pipe.delete(*self._room_keys(room_code, pids))
+        pipe.zrem(self.ROOMS, room_code)
+        pipe.publish(self.CHANNEL, room_code)
+        # Only the caller that actually removed the room hands its code back
+        if pipe.execute()[0]:
+            self.redis.rpush(self.FREE_CODES, room_code)
+
+        # Players may already have moved on to another room
+        player_keys = [self._player_key(json.loads(pid)) for pid in pids]
+        if player_keys:
+            rooms = self.redis.mget(player_keys)
+            stale = [key for key, room in zip(player_keys, rooms) if room == room_code]
+            if stale:
+                self.redis.delete(*stale)
+
+    def reap(self, ttls, max_rooms, now=None):
+        """Delete idle rooms, then the least recently changed beyond max_rooms
+
+        Safe to run from several workers at once; a room deleted twice is
+        just reported twice.
+        """
+        now = time.time() if now is None else now
+        # Only rooms older than the shortest TTL can have expired
+        candidates = self.redis.zrangebyscore(self.ROOMS, '-inf', now - min(ttls.values()), withscores=True)
+        pipe = self.redis.pipeline(transaction=False)
+        for room_code, _ in candidates:
+            pipe.hget(self._room(room_code), 'status')
+        statuses = pipe.execute()
+
+        reaped = []
+        for (room_code, changed), status in zip(candidates, statuses):
+            if status is None or changed <= now - ttls[status]:
+                self.delete_game(room_code)
+                reaped.append((room_code, 'idle'))
+
+        excess = self.redis.zcard(self.ROOMS) - max_rooms
+        if excess > 0:
+            for room_code in self.redis.zrange(self.ROOMS, 0, excess - 1):
+                self.delete_game(room_code)
+                reaped.append((room_code, 'capacity'))
+        return reaped
+
+    def room_count(self):
+        return self.redis.zcard(self.ROOMS)
+
+    def player_count(self):
+        pipe = self.redis.pipeline(transaction=False)
+        for room_code in self.redis.zrange(self.ROOMS, 0, -1):
+            pipe.hlen(self._room(room_code, 'players'))
+        return sum(pipe.execute())
+
+    def bytes_per_room(self, sample=20):
+        """Average server-side size (MEMORY USAGE) of the most recently changed rooms"""
+        from redis.exceptions import ResponseError
+
+        rooms = self.redis.zrange(self.ROOMS, -sample, -1)
+        if not rooms:
+            return 0
+        total = 0
+        try:
+            for room_code in rooms:
+                pids = self.redis.hkeys(self._room(room_code, 'players'))
+                for key in self._room_keys(room_code, pids):
+                    total += self.redis.memory_usage(key) or 0
+        except ResponseError:
+            # Not every Redis-protocol server has MEMORY USAGE (the local broker does not)
+            return None
+        return total // len(rooms)
+
+    def start_round(self, room_code, board, end_time, expected_status):
+        key, players = self._room(room_code), self._room(room_code, 'players')
+        solutions = self._room(room_code, 'solutions')
+
+        def start(pipe):
+            if pipe.hget(key, 'status') != expected_status:
+                return False
+            pids = pipe.hkeys(players)
+            pipe.multi()
+            pipe.hset(key, mapping={
+                'status': 'playing',
+                'grid': json.dumps(board.grid),
+                'round_end_time': json.dumps(end_time),
+                'seed': json.dumps(board.seed),
+                'solved': '1' if board.solutions is not None else '0',
+                'max_score': json.dumps(board.max_score),
+                'word_filter': json.dumps(board.word_filter),
+                'missed_words': '[]'
+            })
+            pipe.delete(solutions, self._room(room_code, 'submissions'))
+            if board.solutions:
+                pipe.sadd(solutions, *board.solutions)
+
+            # Reset player scores and words
+            for pid in pids:
+                pipe.hset(self._room(room_code, 'scores'), pid, 0)
+                pipe.delete(self._room(room_code, 'words', pid), self._room(room_code, 'wordset', pid))
+            self._bump(pipe, room_code, 'status', 'scores')
+            return True
+
+        return self._transaction(start, key, players)
+
+    def check_solutions(self, room_code, words):
+        # Read in one MULTI so the status and the solutions belong to the same round
+        pipe = self.redis.pipeline()
+        pipe.hget(self._room(room_code), 'status')
+        if words:
+            pipe.smismember(self._room(room_code, 'solutions'), words)
+        status, *found = pipe.execute()
+        if status != 'playing':
+            return None
+        return [bool(ok) for ok in found[0]] if words else []
+
+    def add_words(self, room_code, player_id, words):
+        # One script checks the round and adds the words, so nothing lands after it is scored
+        pid = self._pid(player_id)
+        keys = [self._room(room_code), self._room(room_code, 'players'), self._room(room_code, 'wordset', pid),
+                self._room(room_code, 'words', pid), self._room(room_code, 'scores'), self.ROOMS]
+        args = [pid, room_code, time.time(), self.CHANNEL]
+        for word, score in words:
+            args += [word, score]
+        totals = self._add_words(keys=keys, args=args)
+        if totals is None:
+            return None
+        return [total if total >= 0 else None for total in totals]
+
+    def log_submissions(self, room_code, player_id, words, submitted_at):
+        self.redis.rpush(self._room(room_code, 'submissions'), json.dumps([submitted_at, player_id, list(words)]))
+
+    def get_submissions(self, room_code):
+        return [tuple(json.loads(entry)) for entry in self.redis.lrange(self._room(room_code, 'submissions'), 0, -1)]
+
+    def finish_game(self, room_code):
+        key = self._room(room_code)
+
+        def finish(pipe):
+            if pipe.hget(key, 'status') != 'playing':
+                return False
+            pipe.multi()
+            pipe.hset(key, 'status', 'finished')
+            self._bump(pipe, room_code, 'status')
+            return True
+
+        return self._transaction(finish, key)
+
+    def save_results(self, room_code, players, missed_words):
+        key, room_players = self._room(room_code), self._room(room_code, 'players')
+
+        # Watched like remove_player, so results are never written into a deleted room
+        def save(pipe):
+            if not pipe.exists(key):
+                return
+            pipe.multi()
+            for player_id, result in players.items():
+                pid = self._pid(player_id)
+                words = self._room(room_code, 'words', pid)
+                pipe.hset(self._room(room_code, 'scores'), pid, result['score'])
+                pipe.delete(words)
+                if result['words']:
+                    pipe.rpush(words, *result['words'])
+            pipe.hset(key, mapping={'missed_words': json.dumps(missed_words), 'word_filter': 'null'})
+            # The round is over, so the solutions, their filter, duplicate checks and the submission
+            # log (already read by finish_round) are no longer needed
+            pipe.delete(self._room(room_code, 'solutions'), self._room(room_code, 'submissions'),
+                        *(self._room(room_code, 'wordset', self._pid(pid)) for pid in players))
+            self._bump(pipe, room_code, 'scores', 'results')
+
+        self._transaction(save, room_players)
+
+    def _tournament_key(self, code):
+        return f"{self.PREFIX}:tournament:{code}"
+
+    def create_tournament(self, code, state):
+        key, room_key = self._tournament_key(code), self._room(code)
+
+        def create(pipe):
+            if pipe.exists(key, room_key):
+                return False
+            pipe.multi()
+            pipe.set(key, json.dumps(state))
+            return True
+
+        return self._transaction(create, key, room_key)
+
+    def get_tournament(self, code):
+        state = self.redis.get(self._tournament_key(code))
+        return json.loads(state) if state is not None else None
+
+    def update_tournament(self, code, update):
+        key = self._tournament_key(code)
+
+        def apply(pipe):
+            state = pipe.get(key)
+            if state is None:
+                return None
+            state = json.loads(state)
+            result = update(state)
+            pipe.multi()
+            pipe.set(key, json.dumps(state))
+            return result
+
+        return self._transaction(apply, key)
+
+    def delete_tournament(self, code):
+        if self.redis.delete(self._tournament_key(code)):
+            self.redis.rpush(self.FREE_CODES, code)
+
+    def set_player_room(self, player_id, room_code):
+        self.redis.set(self._player_key(player_id), room_code)
+
+    def get_player_room(self, player_id):
+        return self.redis.get(self._player_key(player_id))
+
+    def delete_player_room(self, player_id):
+        self.redis.delete(self._player_key(player_id))
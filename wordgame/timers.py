@@ -0,0 +1,80 @@
+import heapq
+import itertools
+import threading
+import time
+
+
+class RoundTimers:
+    """Single thread that ends every room's round when its deadline passes
+
+    Deadlines live in one heap, so a parked room costs one heap entry instead
+    of a sleeping task. Each room has at most one live deadline: scheduling a
+    room again (a restart) or cancelling it leaves the old heap entry behind as
+    stale, and stale entries are skipped when popped and compacted away once
+    they outnumber the live ones.
+    """
+
+    def __init__(self, callback, clock=time.time):
+        self.callback = callback
+        self.clock = clock
+        self._deadlines = {}
+        self._heap = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def start(self):
+        """Start the timer thread (safe to call more than once)"""
+        with self._condition:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='round-timers', daemon=True)
+                self._thread.start()
+
+    def schedule(self, room, deadline):
+        """Call callback(room) at deadline, replacing any earlier timer for room"""
+        with self._condition:
+            entry = (deadline, next(self._counter), room)
+            self._deadlines[room] = entry
+            heapq.heappush(self._heap, entry)
+            self._compact()
+            # Only wake the thread if this is now the earliest deadline
+            if self._heap[0] is entry:
+                self._condition.notify()
+
+    def cancel(self, room):
+        """Forget room's pending timer, if any"""
+        with self._condition:
+            self._deadlines.pop(room, None)
+
+    def _compact(self):
+        if len(self._heap) > 2 * len(self._deadlines) + 64:
+            self._heap = list(self._deadlines.values())
+            heapq.heapify(self._heap)
+
+    def _pop_due(self):
+        """Wait for the next live deadline and return its room"""
+        with self._condition:
+            while True:
+                while self._heap and self._deadlines.get(self._heap[0][2]) is not self._heap[0]:
+                    heapq.heappop(self._heap)
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+                delay = self._heap[0][0] - self.clock()
+                if delay > 0:
+                    self._condition.wait(delay)
+                    continue
+                room = heapq.heappop(self._heap)[2]
+                del self._deadlines[room]
+                return room
+
+    def _run(self):
+        while True:
+            room = self._pop_due()
+            try:
+                self.callback(room)
+            except Exception as exc:
+                print(f"Error ending round in room {room}: {exc!r}")
@@ -0,0 +1,98 @@
+"""Knockout tournaments played as many concurrent rooms
+
+A tournament's state is a plain dict kept in the game store:
+  {'status': 'waiting' | 'playing' | 'finished',
+   'room_size': int, 'stage': int,
+   'players': {player_id: name},
+   'rooms': {room_code: [player_id, ...] of winners, or None while playing},
+   'byes': [player_id, ...] of players going through without playing,
+   'champions': [player_id, ...]}
+Each stage splits the remaining players into rooms of at most room_size that
+all play at once. One player goes through from each room (ties are drawn at
+random) until a stage fits in a single room, whose winners are the champions.
+A player who would be left alone in a room gets a bye to the next stage.
+The functions below only change the dict; the app creates the rooms.
+"""
+import os
+import random
+
+MAX_TOURNAMENT_PLAYERS = int(os.getenv('MAX_TOURNAMENT_PLAYERS', 1000))
+
+
+def new_tournament(player_id, player_name, room_size):
+    return {
+        'status': 'waiting',
+        'room_size': room_size,
+        'stage': 0,
+        'players': {player_id: player_name},
+        'rooms': {},
+        'byes': [],
+        'champions': []
+    }
+
+
+def add_entrant(state, player_id, player_name):
+    """Add a player to a tournament that has not started; returns an error message or None"""
+    if state['status'] != 'waiting':
+        return 'Tournament already started'
+    if len(state['players']) >= MAX_TOURNAMENT_PLAYERS:
+        return 'Tournament is full'
+    state['players'][player_id] = player_name
+    return None
+
+
+def start_tournament(state):
+    """Close entries; True only for the first caller"""
+    if state['status'] != 'waiting':
+        return False
+    state['status'] = 'playing'
+    return True
+
+
+def split_into_rooms(player_ids, room_size):
+    """Shuffle players into as few rooms as possible, with sizes differing by at most one
+
+    Returns (rooms, byes). Only an odd number of players in rooms of two can
+    leave someone alone in a room; that player is a bye instead.
+    """
+    player_ids = list(player_ids)
+    random.shuffle(player_ids)
+    count = -(-len(player_ids) // room_size)
+    rooms = [player_ids[i::count] for i in range(count)]
+    if len(rooms) > 1 and len(rooms[-1]) == 1:
+        return rooms[:-1], rooms[-1]
+    return rooms, []
+
+
+def begin_stage(state, rooms, byes=()):
+    """Record a new stage; rooms maps each room code to the players in it"""
+    state['status'] = 'playing'
+    state['stage'] += 1
+    state['rooms'] = {room_code: None for room_code in rooms}
+    state['byes'] = list(byes)
+    return state['stage']
+
+
+def record_result(state, room_code, winners):
+    """Record a finished room
+
+    Returns None while other rooms of the stage are still playing (or if this
+    room was already recorded), otherwise the ids of the players going on to
+    the next stage. Once the tournament is over that list is empty and
+    state['champions'] holds the winners.
+    """
+    if state['status'] != 'playing' or state['rooms'].get(room_code, ()) is not None:
+        return None
+
+    byes = state.get('byes', [])
+    final = len(state['rooms']) == 1 and not byes
+    state['rooms'][room_code] = list(winners) if final else random.sample(winners, min(1, len(winners)))
+    if any(result is None for result in state['rooms'].values()):
+        return None
+
+    advancing = byes + [player_id for result in state['rooms'].values() for player_id in result]
+    if final or len(advancing) <= 1:
+        state['status'] = 'finished'
+        state['champions'] = advancing
+        return []
+    return advancing